@@ -1,9 +1,34 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-import cv2
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import os
+import time
+
+from src.model_registry import registry
+from src.broadcaster import Broadcaster
+from src.incident_buffer import IncidentBuffer
+from src.live_stream import LiveStreams
+from src.metrics import metrics, CONTENT_TYPE
+
+
+logging.basicConfig(
+    level=os.getenv("AEGIS_LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load and warm the detector once, not at import or first frame
+    registry.warm_up()
+    yield
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -12,77 +37,164 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Last-Seq"],
 )
 
-INCIDENTS = []
+# Most recent alerts with running per-level counts
+INCIDENTS = IncidentBuffer(capacity=int(os.getenv("AEGIS_ALERT_CAPACITY", "50")))
+
+# Pushes new alerts and stat changes to every open dashboard
+broadcaster = Broadcaster()
+
+metrics.gauge("sse_subscribers", lambda: len(broadcaster.subscribers))
 
 # -------------------------------
 # API FOR DATA
 # -------------------------------
+def check_alert(data):
+    try:
+        INCIDENTS.check(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/analyze")
 async def analyze(request: Request):
     data = await request.json()
-    INCIDENTS.append(data)
+    check_alert(data)
+
+    seq, delta = INCIDENTS.append(data)
+    metrics.inc("alerts")
+
+    broadcaster.publish("incident", data, event_id=seq)
+    if delta:
+        broadcaster.publish("stats", delta)
 
-    if len(INCIDENTS) > 50:
-        INCIDENTS.pop(0)
+    return {"status": "ok", "seq": seq}
 
-    return {"status": "ok"}
+@app.post("/analyze/batch")
+async def analyze_batch(request: Request):
+    """
+    Ingest a list of alerts in one request, in order. Nothing is stored
+    unless every alert is valid.
+    """
+    records = await request.json()
+
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON list")
+
+    for i, data in enumerate(records):
+        try:
+            INCIDENTS.check(data)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Alert {i}: {e}")
+
+    seq = INCIDENTS.last_seq
+    for data in records:
+        seq, delta = INCIDENTS.append(data)
+
+        broadcaster.publish("incident", data, event_id=seq)
+        if delta:
+            broadcaster.publish("stats", delta)
+
+    metrics.inc("alerts", len(records))
+    return {"status": "ok", "count": len(records), "seq": seq}
+
+@app.get("/models")
+def get_models():
+    return registry.stats()
+
+@app.get("/metrics")
+def get_metrics():
+    """Stage timings and counters in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
 
 @app.get("/alerts")
-def get_alerts():
-    return INCIDENTS
+def get_alerts(response: Response, since: int = 0):
+    """
+    Alerts newer than sequence number `since`, oldest first. The latest
+    sequence number is returned in the X-Last-Seq header.
+    """
+    records, last_seq = INCIDENTS.since(since)
+    response.headers["X-Last-Seq"] = str(last_seq)
+    return records
 
 @app.get("/stats")
 def get_stats():
-    stats = {"LOW": 0, "MEDIUM": 0, "HIGH": 0}
-    for i in INCIDENTS:
-        stats[i["risk_level"]] += 1
-    return stats
+    return INCIDENTS.stats()
+
+@app.get("/events")
+async def events():
+    """
+    Server-Sent Events: a `snapshot` of current alerts and stats, then an
+    `incident` event per new alert and a `stats` event with the per-level
+    count changes it caused.
+    """
+    subscriber = broadcaster.subscribe()
+    records, stats, seq = INCIDENTS.snapshot()
+    snapshot = Broadcaster.encode(
+        "snapshot",
+        {"alerts": records, "stats": stats, "capacity": INCIDENTS.capacity},
+        event_id=seq
+    )
+
+    return StreamingResponse(
+        broadcaster.stream(subscriber, first=snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 # -------------------------------
 # VIDEO STREAM
 # -------------------------------
-from src.detection import ObjectDetector
-from src.tracking import CentroidTracker
-
-detector = ObjectDetector()
-tracker = CentroidTracker()
-
-def generate_frames():
-    cap = cv2.VideoCapture("data/videos/test_near_miss.mp4")
+# Sources viewers may pick with ?source=
+VIDEO_SOURCES = {
+    "default": os.getenv("AEGIS_VIDEO_SOURCE", "data/videos/test_near_miss.mp4"),
+}
 
-    while True:
-        success, frame = cap.read()
-        if not success:
-            break
+# One capture/detect/track producer per source, shared by all viewers
+live_streams = LiveStreams()
 
-        frame = cv2.resize(frame, (640, 480))
 
-        # 🔥 DETECTION
-        detections = detector.detect(frame)
-        tracked_objects = tracker.update(detections)
+async def generate_frames(source, fps, quality):
+    """
+    MJPEG parts at up to `fps`, always the newest frame. A viewer slower
+    than the producer skips frames instead of building a backlog.
 
-        # 🔥 DRAW BOXES
-        for obj in tracked_objects:
-            x1, y1, x2, y2 = obj["bbox"]
-            label = f"{obj['class']} #{obj['id']}"
+    The viewer joins the producer only once the response starts, so a
+    client that disconnects before that is never counted.
+    """
+    interval = 1 / fps
+    last_seq = 0
 
-            color = (0, 255, 0) if obj["class"] == "person" else (0, 0, 255)
+    producer = live_streams.join(source)
+    try:
+        while True:
+            started = time.monotonic()
 
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-            cv2.putText(frame, label, (x1, y1 - 5),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            if producer.latest.seq != last_seq:
+                last_seq, frame = await run_in_threadpool(producer.latest.jpeg, quality)
 
-        # convert to stream
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame = buffer.tobytes()
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
 
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+                await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+            elif producer.finished:
+                break
+            else:
+                await asyncio.sleep(min(interval, 0.01))
+    finally:
+        producer.remove_viewer()
 
 @app.get("/video_feed")
-def video_feed():
-    return StreamingResponse(generate_frames(),
-                             media_type='multipart/x-mixed-replace; boundary=frame')
\ No newline at end of file
+def video_feed(
+    source: str = "default",
+    fps: float = Query(15, gt=0, le=60),
+    quality: int = Query(80, ge=10, le=95)
+):
+    if source not in VIDEO_SOURCES:
+        raise HTTPException(status_code=404, detail="Unknown video source")
+
+    return StreamingResponse(generate_frames(VIDEO_SOURCES[source], fps, quality),
+                             media_type='multipart/x-mixed-replace; boundary=frame')
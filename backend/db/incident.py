@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime
+from sqlalchemy import Column, Integer, Float, String, DateTime, Index
 from backend.db.base import Base
 from datetime import datetime, timezone
 import uuid
@@ -6,10 +6,16 @@ import uuid
 
 class Incident(Base):
     __tablename__ = "incidents"
+    __table_args__ = (
+        Index("ix_incidents_video_risk", "video_id", "risk_level"),
+        Index("ix_incidents_video_frame", "video_id", "frame_number"),
+        # Keyset pages filtered by level read in id order straight from the index
+        Index("ix_incidents_risk_id", "risk_level", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
 
-    timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
     video_id = Column(String, index=True)
     video_source = Column(String)
 
@@ -20,7 +26,7 @@ class Incident(Base):
     ttc_seconds = Column(Float)
     relative_velocity = Column(Float)
 
-    nmrs_score = Column(Float)
+    nmrs_score = Column(Float, index=True)
     risk_level = Column(String)
 
     frame_number = Column(Integer)
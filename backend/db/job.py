@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from backend.db.base import Base
+from datetime import datetime, timezone
+import uuid
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True, default=lambda: uuid.uuid4().hex)
+
+    status = Column(String, index=True, default="queued")
+
+    video_id = Column(String, index=True)
+    video_source = Column(String)
+    file_path = Column(String)
+
+    frames_processed = Column(Integer, default=0)
+    frames_total = Column(Integer, default=0)
+    total_incidents = Column(Integer, nullable=True)
+
+    # Process running the job, and its last sign of life; see JobManager
+    owner = Column(String, index=True, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    result = Column(Text, nullable=True)
+    error = Column(String, nullable=True)
+
+    created_at = Column(DateTime, default=_now)
+    updated_at = Column(DateTime, default=_now, onupdate=_now)
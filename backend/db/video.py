@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from backend.db.base import Base
+from datetime import datetime, timezone
+
+
+class Video(Base):
+    __tablename__ = "videos"
+
+    # MD5 of the uploaded file
+    video_id = Column(String, primary_key=True)
+    video_source = Column(String)
+
+    status = Column(String, default="processing")
+    job_id = Column(String, nullable=True)
+
+    total_incidents = Column(Integer, nullable=True)
+    result = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class VideoSummary(Base):
+    __tablename__ = "video_summaries"
+
+    # Refreshed from incidents when a video's analysis finishes
+    video_id = Column(String, primary_key=True)
+
+    total_incidents = Column(Integer, default=0)
+    low = Column(Integer, default=0)
+    medium = Column(Integer, default=0)
+    high = Column(Integer, default=0)
+
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
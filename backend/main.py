@@ -1,32 +1,90 @@
 # backend/main.py
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-import shutil
+from contextlib import asynccontextmanager
+from datetime import datetime
 import os
-import hashlib
-
-from backend.services.ai_summary import generate_batch_summaries
-from backend.services.aegis_service import analyze_video
-from backend.db.session import get_db
+import json
+import logging
+
+from backend.services.jobs import job_manager, job_status, QueueFull
+from backend.services.stats import risk_counts, video_risk_counts
+from backend.services.uploads import UploadError, receive_upload
+from backend.services.incidents import (
+    MAX_PAGE_SIZE, parse_fields, incident_query, fetch_page, iter_pages
+)
+from backend.db.session import get_db, SessionLocal
 from backend.db.incident import Incident
+from backend.db.job import Job
+from backend.db.video import Video
+from src.model_registry import registry
+from src.metrics import metrics, CONTENT_TYPE
+
+
+logging.basicConfig(
+    level=os.getenv("AEGIS_LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+metrics.gauge("jobs_pending", lambda: job_manager.pending)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load and warm the detector before the first upload arrives
+    registry.warm_up()
+    job_manager.start()
+    yield
+    job_manager.shutdown()
 
-app = FastAPI(title="AEGIS API")
+
+app = FastAPI(title="AEGIS API", lifespan=lifespan)
 
 UPLOAD_DIR = "temp_uploads"
+
+DEFAULT_PAGE_SIZE = 100
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
-# -------------------------------
-# HASH FUNCTION (DEDUP)
-# -------------------------------
-def generate_video_hash(file_path):
-    hasher = hashlib.md5()
-    with open(file_path, "rb") as f:
-        while chunk := f.read(8192):
-            hasher.update(chunk)
-    return hasher.hexdigest()
+# The upload is parsed from the raw body (see receive_upload), so the
+# form is described here rather than by an UploadFile parameter
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+
+def _video_response(video):
+    if video.status == "done":
+        return JSONResponse(content={
+            "status": "already_processed",
+            "video_id": video.video_id,
+            "message": "Video already analyzed",
+            "total_incidents": video.total_incidents,
+            "data": json.loads(video.result or "[]")
+        })
+
+    return JSONResponse(status_code=202, content={
+        "status": "processing",
+        "job_id": video.job_id,
+        "video_id": video.video_id
+    })
 
 
 @app.get("/")
@@ -34,27 +92,41 @@ def root():
     return {"message": "AEGIS API running"}
 
 
+@app.get("/models")
+def get_models():
+    return registry.stats()
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Stage timings and counters in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
+
 # -------------------------------
-# ANALYZE (WRITE TO DB)
+# ANALYZE (QUEUE A JOB)
 # -------------------------------
-@app.post("/analyze")
-async def analyze(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    try:
-        if not file.filename.endswith((".mp4", ".avi", ".mov")):
-            raise HTTPException(status_code=400, detail="Invalid file format")
-
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
+@app.post("/analyze", openapi_extra=UPLOAD_OPENAPI)
+async def analyze(request: Request, profile: bool = Query(False),
+                  db: Session = Depends(get_db)):
+    filename = None
 
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+    try:
+        # 🔥 HASH-BASED VIDEO ID, computed while the upload streams to disk
+        try:
+            filename, file_path, video_id = await receive_upload(request, UPLOAD_DIR)
+        except UploadError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        # 🔥 HASH-BASED VIDEO ID
-        video_id = generate_video_hash(file_path)
+        # 🔥 CHECK IF ALREADY PROCESSED OR IN PROGRESS
+        video = db.get(Video, video_id)
 
-        # 🔥 CHECK IF ALREADY PROCESSED
-        existing = db.query(Incident).filter(Incident.video_id == video_id).first()
+        if video is not None and video.status in ("done", "processing"):
+            os.remove(file_path)
+            return _video_response(video)
 
-        if existing:
+        # Analyzed before the videos table existed
+        if video is None and db.query(Incident.id).filter(Incident.video_id == video_id).first():
             os.remove(file_path)
             return JSONResponse(content={
                 "status": "already_processed",
@@ -62,75 +134,149 @@ async def analyze(file: UploadFile = File(...), db: Session = Depends(get_db)):
                 "message": "Video already analyzed"
             })
 
-        # RUN ANALYSIS
-        incidents = analyze_video(file_path)
-
-        os.remove(file_path)
-
-        # 🔥 BATCH GEMINI
         try:
-            summaries = generate_batch_summaries(incidents)
-        except Exception:
-            summaries = ["AI summary unavailable"] * len(incidents)
-
-        # SAVE TO DATABASE
-        for inc, summary in zip(incidents, summaries):
-            db_incident = Incident(
-                video_id=video_id,
-                video_source=file.filename,
-                object_1=inc["object_1"],
-                object_2=inc["object_2"],
-                distance_m=inc["distance_m"],
-                ttc_seconds=inc["ttc_seconds"],
-                relative_velocity=inc["relative_velocity"],
-                nmrs_score=inc["nmrs_score"],
-                risk_level=inc["risk_level"],
-                frame_number=inc["frame_number"],
-                ai_summary=summary
-            )
-            db.add(db_incident)
-
-        db.commit()
+            job = job_manager.submit(db, file_path, filename, video_id, profile=profile)
+        except QueueFull as e:
+            os.remove(file_path)
+            raise HTTPException(status_code=503, detail=str(e))
+        except IntegrityError:
+            # A concurrent upload of the same file registered it first
+            db.rollback()
+            os.remove(file_path)
+            return _video_response(db.get(Video, video_id))
 
-        return JSONResponse(content={
-            "status": "success",
-            "video_id": video_id,
-            "total_incidents": len(incidents),
-            "data": incidents
+        return JSONResponse(status_code=202, content={
+            "status": job.status,
+            "job_id": job.id,
+            "video_id": video_id
         })
 
+    except HTTPException:
+        raise
     except Exception as e:
+        logger.exception("Upload of %s failed", filename)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# -------------------------------
+# JOB STATUS / RESULT
+# -------------------------------
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, db: Session = Depends(get_db)):
+    job = db.get(Job, job_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job_status(job)
+
+
+@app.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str, db: Session = Depends(get_db)):
+    job = db.get(Job, job_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error or "Analysis failed")
+
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+
+    return {
+        "status": "success",
+        "video_id": job.video_id,
+        "total_incidents": job.total_incidents,
+        "data": json.loads(job.result or "[]")
+    }
+
+
+@app.get("/jobs/{job_id}/profile")
+def get_job_profile(job_id: str):
+    """cProfile stats of a job uploaded with ?profile=true."""
+    path = job_manager.profile_path(job_id)
+
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="No profile for this job")
+
+    return FileResponse(path, media_type="application/octet-stream",
+                        filename=f"{job_id}.prof")
+
+
 # -------------------------------
 # GET ALL INCIDENTS
 # -------------------------------
 @app.get("/incidents")
-def get_incidents(video_id: str = None, db: Session = Depends(get_db)):
-    query = db.query(Incident)
+def get_incidents(
+    request: Request,
+    video_id: str = None,
+    risk_level: str = None,
+    min_nmrs: float = None,
+    max_nmrs: float = None,
+    since: datetime = None,
+    until: datetime = None,
+    cursor: int = None,
+    limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: str = None,
+    format: str = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Newest first, one keyset page at a time: pass the X-Next-Cursor
+    header of a response as ?cursor= to get the next page.
+
+    With format=ndjson or Accept: application/x-ndjson the rows are
+    streamed one JSON object per line; without a limit every matching
+    row from the cursor onwards is streamed.
+    """
+    try:
+        names = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    if video_id:
-        query = query.filter(Incident.video_id == video_id)
+    query = incident_query(
+        names, video_id=video_id, risk_level=risk_level, min_nmrs=min_nmrs,
+        max_nmrs=max_nmrs, since=since, until=until
+    )
 
-    data = query.order_by(Incident.id.desc()).all()
+    ndjson = format == "ndjson" or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
 
-    return [
-        {
-            "video_id": i.video_id,
-            "object_1": i.object_1,
-            "object_2": i.object_2,
-            "distance_m": i.distance_m,
-            "ttc_seconds": i.ttc_seconds,
-            "relative_velocity": i.relative_velocity,
-            "nmrs_score": i.nmrs_score,
-            "risk_level": i.risk_level,
-            "frame_number": i.frame_number,
-            "video_source": i.video_source,
-            "ai_summary": i.ai_summary
-        }
-        for i in data
-    ]
+    if ndjson and limit is None:
+        return StreamingResponse(
+            _ndjson_lines(_stream_incidents(query, names, cursor)),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+
+    rows, next_cursor = fetch_page(db, query, names, cursor, limit or DEFAULT_PAGE_SIZE)
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else {}
+
+    if ndjson:
+        return StreamingResponse(
+            _ndjson_lines(rows), media_type=NDJSON_MEDIA_TYPE, headers=headers
+        )
+
+    return JSONResponse(content=jsonable_encoder(rows), headers=headers)
+
+
+def _stream_incidents(query, fields, cursor):
+    # Own session: the generator outlives the request handler
+    db = SessionLocal()
+    try:
+        yield from iter_pages(db, query, fields, cursor)
+    finally:
+        db.close()
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, default=_json_default) + "\n"
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
 
 
 # -------------------------------
@@ -138,16 +284,7 @@ def get_incidents(video_id: str = None, db: Session = Depends(get_db)):
 # -------------------------------
 @app.get("/stats")
 def get_stats(video_id: str = None, db: Session = Depends(get_db)):
-    query = db.query(Incident)
-
-    if video_id:
-        query = query.filter(Incident.video_id == video_id)
-
-    return {
-        "LOW": query.filter(Incident.risk_level == "LOW").count(),
-        "MEDIUM": query.filter(Incident.risk_level == "MEDIUM").count(),
-        "HIGH": query.filter(Incident.risk_level == "HIGH").count(),
-    }
+    return risk_counts(db, video_id)
 
 
 # -------------------------------
@@ -171,41 +308,33 @@ def get_videos(db: Session = Depends(get_db)):
 # -------------------------------
 @app.get("/video/{video_id}")
 def get_video_data(video_id: str, db: Session = Depends(get_db)):
-    incidents = db.query(Incident)\
-        .filter(Incident.video_id == video_id)\
-        .order_by(Incident.id.desc())\
-        .all()
+    stats = video_risk_counts(db, video_id)
+    total = sum(stats.values())
 
-    if not incidents:
+    if not total:
         raise HTTPException(status_code=404, detail="Video not found")
 
-    low = sum(1 for i in incidents if i.risk_level == "LOW")
-    medium = sum(1 for i in incidents if i.risk_level == "MEDIUM")
-    high = sum(1 for i in incidents if i.risk_level == "HIGH")
+    incidents = db.query(
+        Incident.id,
+        Incident.object_1,
+        Incident.object_2,
+        Incident.distance_m,
+        Incident.ttc_seconds,
+        Incident.relative_velocity,
+        Incident.nmrs_score,
+        Incident.risk_level,
+        Incident.frame_number,
+        Incident.ai_summary
+    )\
+        .filter(Incident.video_id == video_id)\
+        .order_by(Incident.id.desc())\
+        .all()
 
     return {
         "video_id": video_id,
-        "total_incidents": len(incidents),
-        "stats": {
-            "LOW": low,
-            "MEDIUM": medium,
-            "HIGH": high
-        },
-        "incidents": [
-            {
-                "id": i.id,
-                "object_1": i.object_1,
-                "object_2": i.object_2,
-                "distance_m": i.distance_m,
-                "ttc_seconds": i.ttc_seconds,
-                "relative_velocity": i.relative_velocity,
-                "nmrs_score": i.nmrs_score,
-                "risk_level": i.risk_level,
-                "frame_number": i.frame_number,
-                "ai_summary": i.ai_summary
-            }
-            for i in incidents
-        ]
+        "total_incidents": total,
+        "stats": stats,
+        "incidents": [i._asdict() for i in incidents]
     }
 
 # -------------------------------
@@ -214,33 +343,26 @@ def get_video_data(video_id: str, db: Session = Depends(get_db)):
 @app.get("/graph-data/{video_id}")
 def get_graph_data(video_id: str, db: Session = Depends(get_db)):
 
-    incidents = db.query(Incident)\
-        .filter(Incident.video_id == video_id)\
-        .all()
-
-    if not incidents:
-        raise HTTPException(status_code=404, detail="No data")
-
     # -------------------------------
     # GRAPH 1: Risk Distribution
     # -------------------------------
-    risk_counts = {"LOW": 0, "MEDIUM": 0, "HIGH": 0}
-    for i in incidents:
-        risk_counts[i.risk_level] += 1
+    risk_distribution = video_risk_counts(db, video_id)
 
-    # -------------------------------
-    # GRAPH 2: Distance vs TTC
-    # -------------------------------
-    distance = [i.distance_m for i in incidents]
-    ttc = [i.ttc_seconds for i in incidents]
+    if not sum(risk_distribution.values()):
+        raise HTTPException(status_code=404, detail="No data")
 
     # -------------------------------
-    # GRAPH 3: NMRS Trend
+    # GRAPH 2 + 3: Distance vs TTC, NMRS Trend
     # -------------------------------
-    nmrs = [i.nmrs_score for i in incidents]
+    rows = db.query(Incident.distance_m, Incident.ttc_seconds, Incident.nmrs_score)\
+        .filter(Incident.video_id == video_id)\
+        .order_by(Incident.id)\
+        .all()
+
+    distance, ttc, nmrs = (list(col) for col in zip(*rows)) if rows else ([], [], [])
 
     return {
-        "risk_distribution": risk_counts,
+        "risk_distribution": risk_distribution,
         "distance_vs_ttc": {
             "distance": distance,
             "ttc": ttc
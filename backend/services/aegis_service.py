@@ -1,14 +1,27 @@
 # backend/services/aegis_service.py
 
-from src.video_io import open_video, read_frame, release_video
-from src.detection import ObjectDetector
-from src.tracking import CentroidTracker
+from src.video_io import (
+    open_video, open_decoder, read_frame, read_batches, release_video, scale_detections,
+    keyframe_indices, seek_frame
+)
+from src.model_registry import registry
+from src.tracking import ArrayCentroidTracker
 from src.motion import RelativeMotionAnalyzer
-from src.risk_model import NearMissRiskModel, NearMissEventDetector
+from src.risk_model import NearMissRiskModel, NearMissEventDetector, risk_level
+from src.pipeline import StagedPipeline
+from src.scheduler import DetectionScheduler
+from src.roi import MotionGate, GatedDetector
+from src.metrics import metrics
+from src.checkpoint import load_checkpoint, save_checkpoint
+import logging
+import os
 import numpy as np
 import cv2
 
 
+logger = logging.getLogger(__name__)
+
+
 # Homography Matrix
 H = np.array([
     [-1.26050328e+00, -2.28373535e+00, 252.471392],
@@ -17,77 +30,354 @@ H = np.array([
 ])
 
 
-def analyze_video(video_path: str):
-    try:
-        cap = open_video(video_path)
+class FrameAnalyzer:
+    """
+    Tracking and risk stage of the pipeline.
+    Must see frames in order; keeps the strongest near-miss per pair.
+    """
+
+    def __init__(self, fps, motion_mode="active_pair"):
+        self.fps = fps
+        self.tracker = ArrayCentroidTracker()
+        self.motion = RelativeMotionAnalyzer(H, mode=motion_mode)
+        self.risk = NearMissRiskModel()
+        self.event = NearMissEventDetector()
+        self.best_events = {}
+
+        # Highest NMRS and lowest TTC of the last processed frame
+        self.peak_nmrs = None
+        self.min_ttc = None
+
+    def process(self, frame_idx, detections):
+        metrics.inc("frames")
+        metrics.inc("detections", len(detections))
+
+        first_new_id = self.tracker.next_id
+        with metrics.span("track"):
+            store = self.tracker.update_store(detections)
+        metrics.inc("tracks", self.tracker.next_id - first_new_id)
+
+        self.peak_nmrs = None
+        self.min_ttc = None
+
+        if self.motion.mode == "all_pairs":
+            self._process_columns(frame_idx, store)
+            return
+
+        with metrics.span("motion"):
+            motion_data = self.motion.analyze_store(store, frame_idx, self.fps)
+
+        if not motion_data:
+            return
+
+        with metrics.span("risk"):
+            risk_data = self.risk.compute_nmrs(motion_data)
+            event_data = self.event.update(risk_data)
+
+        self.peak_nmrs = max(r["nmrs"] for r in risk_data)
+        self.min_ttc = min(r["ttc"] for r in risk_data)
+
+        for e in event_data:
+            if e.get("near_miss", False):
+                self._record(frame_idx, e)
+
+    def _process_columns(self, frame_idx, store):
+        # Every pair scored as arrays; dicts only for near-miss rows
+        with metrics.span("motion"):
+            cols = self.motion.analyze_all_pairs(store, frame_idx, self.fps)
+
+        if cols is None:
+            return
+
+        with metrics.span("risk"):
+            nmrs = self.risk.compute_nmrs_arrays(
+                cols["distance"], cols["relative_velocity"], cols["ttc"]
+            )
+            near_miss = self.event.update_arrays(
+                cols["person_id"], cols["vehicle_id"], nmrs,
+                cols["distance"], cols["relative_velocity"]
+            )
 
-        if cap is None:
-            print("Error: Could not open video.")
-            return []
+        self.peak_nmrs = float(nmrs.max())
+        self.min_ttc = float(cols["ttc"].min())
 
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        if fps == 0:
-            fps = 30
+        for i in np.flatnonzero(near_miss):
+            self._record(frame_idx, {
+                "person_id": int(cols["person_id"][i]),
+                "vehicle_id": int(cols["vehicle_id"][i]),
+                "distance": float(cols["distance"][i]),
+                "relative_velocity": float(cols["relative_velocity"][i]),
+                "ttc": float(cols["ttc"][i]),
+                "smooth_nmrs": float(nmrs[i])
+            })
 
-        detector = ObjectDetector()
-        tracker = CentroidTracker()
-        motion = RelativeMotionAnalyzer(H)
-        risk = NearMissRiskModel()
-        event = NearMissEventDetector()
+    def _record(self, frame_idx, e):
+        key = (e["person_id"], e["vehicle_id"])
+        nmrs = float(e["smooth_nmrs"])
 
-        best_events = {}
-        frame_idx = 0
+        ttc_val = e["ttc"]
+        if ttc_val == float("inf") or ttc_val > 10:
+            ttc_val = None
+        else:
+            ttc_val = float(ttc_val)
 
-        while True:
+        if key not in self.best_events or nmrs > self.best_events[key]["nmrs_score"]:
+            self.best_events[key] = {
+                "object_1": str(f"person_{e['person_id']}"),
+                "object_2": str(f"vehicle_{e['vehicle_id']}"),
+                "distance_m": float(round(e["distance"], 3)),
+                "ttc_seconds": ttc_val,
+                "relative_velocity": float(round(e["relative_velocity"], 3)),
+                "nmrs_score": float(round(nmrs, 3)),
+                "risk_level": risk_level(nmrs),
+                "frame_number": int(frame_idx)
+            }
+
+    def incidents(self):
+        return list(self.best_events.values())
+
+    def state_dict(self):
+        """
+        Everything process() carries from one frame to the next, as plain
+        JSON-able values; pair-keyed dicts become [person_id, vehicle_id,
+        value] lists.
+        """
+        def pairs(d):
+            return [[p_id, v_id, value] for (p_id, v_id), value in d.items()]
+
+        return {
+            "tracker": self.tracker.state_dict(),
+            "motion": self.motion.state_dict(),
+            "event": self.event.state_dict(),
+            "best_events": pairs(self.best_events),
+            "peak_nmrs": self.peak_nmrs,
+            "min_ttc": self.min_ttc
+        }
+
+    def load_state_dict(self, state):
+        def pairs(rows):
+            return {(p_id, v_id): value for p_id, v_id, value in rows}
+
+        self.tracker.load_state_dict(state["tracker"])
+        self.motion.load_state_dict(state["motion"])
+        self.event.load_state_dict(state["event"])
+        self.best_events = pairs(state["best_events"])
+        self.peak_nmrs = state["peak_nmrs"]
+        self.min_ttc = state["min_ttc"]
+
+
+def _serial_detections(cap, detector, batch_size):
+    batches = read_batches(cap, batch_size)
+
+    while True:
+        with metrics.span("decode"):
+            frames = next(batches, None)
+        if frames is None:
+            return
+
+        with metrics.span("detect"):
+            detections = detector.detect_batch(frames)
+
+        yield from zip(frames, detections)
+
+
+def video_fps(cap):
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps == 0:
+        fps = 30
+    return fps
+
+
+def video_frame_count(cap):
+    return max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0)
+
+
+def _scheduled_detections(cap, detector, scheduler, analyzer):
+    # Detection depends on the previous frame's risk, so frames go one at a time
+    while True:
+        with metrics.span("decode"):
             ret, frame = read_frame(cap)
-            if not ret:
-                break
-
-            frame_idx += 1
-
-            detections = detector.detect(frame)
-            tracked = tracker.update(detections)
-            motion_data = motion.analyze(tracked, frame_idx, fps)
-
-            if not motion_data:
-                continue
-
-            risk_data = risk.compute_nmrs(motion_data)
-            event_data = event.update(risk_data)
-
-            for e in event_data:
-                if not e.get("near_miss", False):
-                    continue
-
-                key = (e["person_id"], e["vehicle_id"])
-                nmrs = float(e["smooth_nmrs"])
-
-                ttc_val = e["ttc"]
-                if ttc_val == float("inf") or ttc_val > 10:
-                    ttc_val = None
-                else:
-                    ttc_val = float(ttc_val)
-
-                if key not in best_events or nmrs > best_events[key]["nmrs_score"]:
-                    best_events[key] = {
-                        "object_1": str(f"person_{e['person_id']}"),
-                        "object_2": str(f"vehicle_{e['vehicle_id']}"),
-                        "distance_m": float(round(e["distance"], 3)),
-                        "ttc_seconds": ttc_val,
-                        "relative_velocity": float(round(e["relative_velocity"], 3)),
-                        "nmrs_score": float(round(nmrs, 3)),
-                        "risk_level": "HIGH" if nmrs > 0.7 else "MEDIUM",
-                        "frame_number": int(frame_idx)
-                    }
+        if not ret:
+            return
+
+        with metrics.span("detect"):
+            detections = scheduler.next(frame, detector)
 
+        yield frame, detections
+        scheduler.update_risk(analyzer.peak_nmrs, analyzer.min_ttc)
+
+
+def _analyze_frames(cap, detector, analyzer, batch_size, pipelined, progress=None,
+                    scheduler=None, gate=None, scale=None, first_frame=0, frames_total=None,
+                    checkpoint=None, checkpoint_every=None, frames=None):
+    # first_frame: frames analyzed before the ones cap will yield
+    # frames: a ready-made (frame, detections) source, e.g. parallel_detections
+    if frames_total is None:
+        frames_total = video_frame_count(cap)
+
+    if gate is not None:
+        detector = GatedDetector(detector, gate)
+
+    if frames is None:
+        if scheduler is not None:
+            frames = _scheduled_detections(cap, detector, scheduler, analyzer)
+        elif pipelined:
+            frames = StagedPipeline(cap, detector, batch_size=batch_size)
+        else:
+            frames = _serial_detections(cap, detector, batch_size)
+
+    frame_idx = first_frame
+    for _, detections in frames:
+        frame_idx += 1
+
+        # Boxes back in source pixels, where H and the tracker gates apply
+        if scale is not None:
+            detections = scale_detections(detections, *scale)
+
+        analyzer.process(frame_idx, detections)
+
+        if progress is not None:
+            progress(frame_idx, frames_total)
+
+        if checkpoint is not None and checkpoint_every and frame_idx % checkpoint_every == 0:
+            checkpoint(frame_idx)
+
+    return frame_idx
+
+
+def analyze_video(video_path: str, batch_size: int = 8, pipelined: bool = True,
+                  motion_mode: str = "active_pair", workers: int = 1, detector=None,
+                  progress=None, detect_interval: int = 1, motion_gate: bool = False,
+                  roi=None, decoder: str = "opencv", decode_size=None, checkpoint=None,
+                  checkpoint_every: int = 300, append: bool = False):
+    """
+    progress, if given, is called as progress(frames_processed, frames_total).
+
+    detect_interval > 1 runs the detector every that many frames and
+    propagates boxes in between, falling back to every frame around risky
+    pairs (see DetectionScheduler).
+
+    motion_gate skips or crops inference to where something moves (see
+    GatedDetector); roi, as returned by load_roi, limits it to a polygon.
+
+    decoder ("opencv" or "ffmpeg") and decode_size=(width, height) pick
+    how frames are decoded; with a decode_size, boxes are mapped back to
+    source pixels before tracking.
+
+    checkpoint, a file path, makes the analysis resumable: the pipeline
+    state is saved there every checkpoint_every frames and at the end. A
+    call that finds a checkpoint for the same video seeks past the frames
+    it covers and carries on, keeping the incidents found so far. With
+    append=True the video may instead be new footage from the same camera
+    (the next file of a continuous recording): it is read from its first
+    frame, with tracks and frame numbers continuing from the checkpoint.
+    The motion gate relearns its background after a resume.
+
+    The options above use a single process. Otherwise workers > 1 runs
+    detection in that many processes (see parallel_detections), with the
+    same incidents as workers=1.
+
+    Errors propagate, so a failed analysis fails its job.
+    """
+    serial_only = detect_interval > 1 or motion_gate or decode_size or decoder != "opencv"
+    parallel = workers > 1 and not serial_only
+
+    scale = None
+    if decode_size is None and decoder == "opencv":
+        cap = open_video(video_path)
+    else:
+        cap = open_decoder(video_path, backend=decoder, size=decode_size)
+        if decode_size is not None:
+            src_w, src_h = cap.source_size
+            scale = (src_w / decode_size[0], src_h / decode_size[1])
+
+    if cap is None:
+        logger.error("Could not open video %s", video_path)
+        return []
+
+    fps = video_fps(cap)
+    analyzer = FrameAnalyzer(fps, motion_mode=motion_mode)
+
+    scheduler = None
+    if detect_interval > 1:
+        scheduler = DetectionScheduler(interval=detect_interval)
+
+    gate = MotionGate(roi=roi) if motion_gate else None
+
+    source = os.path.abspath(video_path)
+    # Frames of earlier footage before this video's first frame
+    offset = 0
+    first_frame = 0
+    save = None
+
+    if checkpoint is not None:
+        state = load_checkpoint(checkpoint)
+
+        if state is not None:
+            same_source = state["source"] == source
+            if not same_source and not append:
+                release_video(cap)
+                raise ValueError(f"Checkpoint {checkpoint} is for {state['source']}")
+
+            analyzer.load_state_dict(state["analyzer"])
+            if scheduler is not None and state["scheduler"] is not None:
+                scheduler.load_state_dict(state["scheduler"])
+                # The checkpointed frame's risk was not fed back yet
+                scheduler.update_risk(analyzer.peak_nmrs, analyzer.min_ttc)
+
+            first_frame = state["frame"]
+            if same_source:
+                offset = state["offset"]
+                if not parallel:
+                    seek_frame(cap, first_frame - offset + 1, keyframe_indices(video_path))
+            else:
+                offset = first_frame
+
+            logger.info("Resuming %s from checkpoint at frame %d", video_path, first_frame)
+
+        def save(frame_idx):
+            with metrics.span("checkpoint"):
+                save_checkpoint(checkpoint, {
+                    "source": source,
+                    "frame": frame_idx,
+                    "offset": offset,
+                    "analyzer": analyzer.state_dict(),
+                    "scheduler": scheduler.state_dict() if scheduler is not None else None
+                })
+
+    frames_total = offset + video_frame_count(cap)
+
+    try:
+        if parallel:
+            from backend.services.segments import parallel_detections
+            frames = parallel_detections(
+                video_path, workers, batch_size=batch_size, first=first_frame - offset + 1,
+                detector=detector
+            )
+            frame_idx = _analyze_frames(cap, None, analyzer, batch_size, pipelined, progress,
+                                        first_frame=first_frame, frames_total=frames_total,
+                                        checkpoint=save, checkpoint_every=checkpoint_every,
+                                        frames=frames)
+        elif detector is None:
+            # Shared, already-loaded model instead of a fresh load per call
+            with registry.detector() as detector:
+                frame_idx = _analyze_frames(cap, detector, analyzer, batch_size, pipelined,
+                                            progress, scheduler, gate, scale, first_frame,
+                                            frames_total, save, checkpoint_every)
+        else:
+            frame_idx = _analyze_frames(cap, detector, analyzer, batch_size, pipelined,
+                                        progress, scheduler, gate, scale, first_frame,
+                                        frames_total, save, checkpoint_every)
+    finally:
         release_video(cap)
 
-        incidents = list(best_events.values())
+    # Where the next call with more footage picks up
+    if save is not None:
+        save(frame_idx)
 
-        print("Total incidents:", len(incidents))
+    incidents = analyzer.incidents()
+    metrics.inc("incidents", len(incidents))
 
-        return incidents
+    logger.info("Total incidents for %s: %d", video_path, len(incidents))
 
-    except Exception as e:
-        print("ERROR in analyze_video:", str(e))
-        return []
\ No newline at end of file
+    return incidents
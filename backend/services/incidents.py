@@ -0,0 +1,113 @@
+# backend/services/incidents.py
+
+from sqlalchemy import select
+
+from backend.db.incident import Incident
+
+
+# Columns a client may ask for with fields=
+INCIDENT_FIELDS = (
+    "id",
+    "timestamp",
+    "video_id",
+    "video_source",
+    "object_1",
+    "object_2",
+    "distance_m",
+    "ttc_seconds",
+    "relative_velocity",
+    "nmrs_score",
+    "risk_level",
+    "frame_number",
+    "ai_summary",
+)
+
+# Shape of the original /incidents response
+DEFAULT_FIELDS = (
+    "video_id",
+    "object_1",
+    "object_2",
+    "distance_m",
+    "ttc_seconds",
+    "relative_velocity",
+    "nmrs_score",
+    "risk_level",
+    "frame_number",
+    "video_source",
+    "ai_summary",
+)
+
+MAX_PAGE_SIZE = 1000
+
+
+def parse_fields(fields):
+    """
+    Comma-separated field names to a tuple; None gives the default set.
+    Raises ValueError for unknown names.
+    """
+    if not fields:
+        return DEFAULT_FIELDS
+
+    names = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [n for n in names if n not in INCIDENT_FIELDS]
+
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    return names or DEFAULT_FIELDS
+
+
+def incident_query(fields, video_id=None, risk_level=None, min_nmrs=None, max_nmrs=None,
+                   since=None, until=None):
+    """
+    SELECT of only the requested columns plus id, newest first.
+    Every filter maps onto an index on the incidents table.
+    """
+    columns = [Incident.id] + [getattr(Incident, f) for f in fields if f != "id"]
+    query = select(*columns)
+
+    if video_id:
+        query = query.where(Incident.video_id == video_id)
+    if risk_level:
+        query = query.where(Incident.risk_level == risk_level)
+    if min_nmrs is not None:
+        query = query.where(Incident.nmrs_score >= min_nmrs)
+    if max_nmrs is not None:
+        query = query.where(Incident.nmrs_score <= max_nmrs)
+    if since is not None:
+        query = query.where(Incident.timestamp >= since)
+    if until is not None:
+        query = query.where(Incident.timestamp < until)
+
+    return query.order_by(Incident.id.desc())
+
+
+def fetch_page(db, query, fields, cursor=None, limit=100):
+    """
+    One keyset page: rows with id < cursor. Returns (rows, next_cursor);
+    next_cursor is None on the last page.
+    """
+    if cursor is not None:
+        query = query.where(Incident.id < cursor)
+
+    # One extra row tells whether another page exists
+    result = db.execute(query.limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(result) > limit:
+        result = result[:limit]
+        next_cursor = result[-1].id
+
+    rows = [{f: getattr(r, f) for f in fields} for r in result]
+
+    return rows, next_cursor
+
+
+def iter_pages(db, query, fields, cursor=None, page_size=MAX_PAGE_SIZE):
+    """Every row from cursor onwards, fetched one keyset page at a time."""
+    while True:
+        rows, cursor = fetch_page(db, query, fields, cursor, page_size)
+        yield from rows
+
+        if cursor is None:
+            return
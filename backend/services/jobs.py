@@ -0,0 +1,380 @@
+# backend/services/jobs.py
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy import insert, or_, update
+
+from backend.db.session import SessionLocal
+from backend.db.job import Job
+from backend.db.incident import Incident
+from backend.db.video import Video
+from backend.services.aegis_service import analyze_video
+from backend.services.ai_summary import generate_batch_summaries
+from backend.services.stats import refresh_video_summary
+from src.checkpoint import load_checkpoint, remove_checkpoint
+from src.metrics import metrics, profiled
+from src.roi import load_roi
+
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class QueueFull(Exception):
+    pass
+
+
+def save_incidents(db, video_id, video_source, incidents, summaries):
+    rows = [
+        {
+            "video_id": video_id,
+            "video_source": video_source,
+            "object_1": inc["object_1"],
+            "object_2": inc["object_2"],
+            "distance_m": inc["distance_m"],
+            "ttc_seconds": inc["ttc_seconds"],
+            "relative_velocity": inc["relative_velocity"],
+            "nmrs_score": inc["nmrs_score"],
+            "risk_level": inc["risk_level"],
+            "frame_number": inc["frame_number"],
+            "ai_summary": summary
+        }
+        for inc, summary in zip(incidents, summaries)
+    ]
+
+    # One executemany instead of an ORM object and flush per incident
+    if rows:
+        db.execute(insert(Incident), rows)
+
+
+def job_status(job):
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "video_id": job.video_id,
+        "video_source": job.video_source,
+        "frames_processed": job.frames_processed,
+        "frames_total": job.frames_total,
+        "total_incidents": job.total_incidents,
+        "error": job.error,
+    }
+
+
+class JobManager:
+    """
+    Runs uploaded-video analysis on a bounded thread pool.
+
+    Job rows in the database are the source of truth for status and
+    progress, so they outlive the process; at most max_pending jobs may
+    be queued or running at once.
+
+    Jobs submitted with profile=True run single-threaded under cProfile
+    and leave their stats in profile_dir/<job_id>.prof.
+
+    Every checkpoint_every frames a running job saves its pipeline state
+    to checkpoint_dir/<job_id>.json, so a job interrupted by a restart
+    resumes from there instead of from its first frame. 0 turns
+    checkpoints off.
+
+    Each active job row is owned by one manager (owner, a per-process id)
+    that renews heartbeat_at every lease/3 seconds once start() is
+    called. Jobs whose owner stopped renewing for `lease` seconds are
+    claimed by exactly one other manager and resumed, so several server
+    processes can share one database.
+    """
+
+    def __init__(self, workers=None, max_pending=None, progress_interval=1.0,
+                 detect_interval=None, profile_dir=None, checkpoint_dir=None,
+                 checkpoint_every=None, segment_workers=None, lease=None):
+        self.workers = workers or int(os.getenv("AEGIS_JOB_WORKERS", "1"))
+        self.max_pending = max_pending or int(os.getenv("AEGIS_MAX_PENDING_JOBS", "16"))
+        self.progress_interval = progress_interval
+        self.detect_interval = detect_interval or int(os.getenv("AEGIS_DETECT_INTERVAL", "1"))
+        # Detector processes per job (see parallel_detections)
+        self.segment_workers = segment_workers or int(os.getenv("AEGIS_SEGMENT_WORKERS", "1"))
+        self.motion_gate = os.getenv("AEGIS_MOTION_GATE", "0") == "1"
+        self.profile_dir = profile_dir or os.getenv("AEGIS_PROFILE_DIR", "profiles")
+        self.checkpoint_dir = checkpoint_dir or os.getenv("AEGIS_CHECKPOINT_DIR", "checkpoints")
+        if checkpoint_every is None:
+            checkpoint_every = int(os.getenv("AEGIS_CHECKPOINT_EVERY", "300"))
+        self.checkpoint_every = checkpoint_every
+
+        self.lease = lease or float(os.getenv("AEGIS_JOB_LEASE", "30"))
+        self.owner = uuid.uuid4().hex
+
+        roi_path = os.getenv("AEGIS_ROI_PATH")
+        self.roi = load_roi(roi_path) if roi_path and os.path.exists(roi_path) else None
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="aegis-job"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._profiled = set()
+        self._stopped = threading.Event()
+        self._watcher = None
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def profile_path(self, job_id):
+        return os.path.join(self.profile_dir, f"{job_id}.prof")
+
+    def checkpoint_path(self, job_id):
+        if not self.checkpoint_every:
+            return None
+        return os.path.join(self.checkpoint_dir, f"{job_id}.json")
+
+    def _reserve(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull("Analysis queue is full")
+            self._pending += 1
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, db, file_path, video_source, video_id, profile=False):
+        """
+        Queue a job and mark the video as processing. Raises QueueFull, or
+        IntegrityError if another upload of the same video won the race.
+        """
+        self._reserve()
+
+        try:
+            job = Job(
+                id=uuid.uuid4().hex,
+                status="queued",
+                owner=self.owner,
+                heartbeat_at=datetime.now(timezone.utc),
+                video_id=video_id,
+                video_source=video_source,
+                file_path=file_path
+            )
+
+            video = db.get(Video, video_id)
+            if video is None:
+                video = Video(video_id=video_id)
+                db.add(video)
+            video.video_source = video_source
+            video.status = "processing"
+            video.job_id = job.id
+
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+
+            if profile:
+                self._profiled.add(job.id)
+            self._executor.submit(self._run, job.id)
+        except Exception:
+            self._release()
+            raise
+
+        return job
+
+    def _run(self, job_id):
+        db = SessionLocal()
+
+        try:
+            job = db.get(Job, job_id)
+            job.status = "running"
+            db.commit()
+
+            last_commit = 0.0
+
+            def progress(frames_processed, frames_total):
+                nonlocal last_commit
+
+                job.frames_processed = frames_processed
+                job.frames_total = frames_total
+
+                now = time.monotonic()
+                if now - last_commit >= self.progress_interval:
+                    db.commit()
+                    last_commit = now
+
+            profile = job_id in self._profiled
+
+            # cProfile only sees the calling thread, so profiled jobs skip
+            # the decode/inference threads
+            with profiled(self.profile_path(job_id) if profile else None), \
+                    metrics.span("job"):
+                incidents = analyze_video(
+                    job.file_path, progress=progress, detect_interval=self.detect_interval,
+                    motion_gate=self.motion_gate, roi=self.roi, pipelined=not profile,
+                    workers=1 if profile else self.segment_workers,
+                    checkpoint=self.checkpoint_path(job_id),
+                    checkpoint_every=self.checkpoint_every
+                )
+
+            try:
+                summaries = generate_batch_summaries(incidents)
+            except Exception:
+                logger.warning("AI summaries failed for job %s", job_id, exc_info=True)
+                summaries = ["AI summary unavailable"] * len(incidents)
+
+            save_incidents(db, job.video_id, job.video_source, incidents, summaries)
+            refresh_video_summary(db, job.video_id)
+
+            job.status = "done"
+            job.total_incidents = len(incidents)
+            job.result = json.dumps(incidents)
+            job.frames_processed = max(job.frames_processed or 0, job.frames_total or 0)
+
+            # Cached for repeat uploads of the same file
+            video = db.get(Video, job.video_id)
+            if video is not None:
+                video.status = "done"
+                video.total_incidents = job.total_incidents
+                video.result = job.result
+
+            db.commit()
+            metrics.inc("jobs_done")
+
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            metrics.inc("jobs_failed")
+            db.rollback()
+            job = db.get(Job, job_id)
+            if job is not None:
+                job.status = "failed"
+                job.error = str(e)
+                self._fail_video(db, job)
+                db.commit()
+
+        finally:
+            job = db.get(Job, job_id)
+            if job is not None and job.file_path and os.path.exists(job.file_path):
+                os.remove(job.file_path)
+            remove_checkpoint(self.checkpoint_path(job_id))
+            db.close()
+            self._profiled.discard(job_id)
+            self._release()
+
+    def _fail_video(self, db, job):
+        video = db.get(Video, job.video_id)
+        if video is not None and video.job_id == job.id:
+            video.status = "failed"
+
+    def _claimable(self, now):
+        # Active, and owned by no live manager other than this one
+        return (
+            Job.status.in_(ACTIVE_STATUSES),
+            or_(Job.owner.is_(None), Job.owner != self.owner),
+            or_(
+                Job.heartbeat_at.is_(None),
+                Job.heartbeat_at < now - timedelta(seconds=self.lease)
+            ),
+        )
+
+    def _claim(self, db, job_id, **values):
+        """
+        Take over a claimable job and set values on it. This is a single
+        conditional UPDATE, so when managers race for the same job only
+        one of them gets a row back.
+        """
+        now = datetime.now(timezone.utc)
+        result = db.execute(
+            update(Job)
+            .where(Job.id == job_id, *self._claimable(now))
+            .values(owner=self.owner, heartbeat_at=now, **values)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    def resume_interrupted(self):
+        """
+        Requeue jobs a stopped process left queued or running, or mark
+        them failed if their upload is gone or this manager's queue is
+        full. A requeued job with a checkpoint picks up from its last
+        checkpointed frame.
+        """
+        db = SessionLocal()
+
+        try:
+            jobs = db.query(Job).filter(*self._claimable(datetime.now(timezone.utc))).all()
+
+            for job in jobs:
+                if not (job.file_path and os.path.exists(job.file_path)):
+                    if self._claim(db, job.id, status="failed",
+                                   error="Interrupted before completion"):
+                        self._fail_video(db, job)
+                        db.commit()
+                    continue
+
+                try:
+                    self._reserve()
+                except QueueFull:
+                    if self._claim(db, job.id, status="failed",
+                                   error="Analysis queue was full when the job was resumed"):
+                        self._fail_video(db, job)
+                        db.commit()
+                    continue
+
+                path = self.checkpoint_path(job.id)
+                state = load_checkpoint(path) if path else None
+                frames_processed = state["frame"] if state is not None else 0
+
+                if not self._claim(db, job.id, status="queued",
+                                   frames_processed=frames_processed):
+                    # Another manager got it first
+                    self._release()
+                    continue
+
+                logger.info("Resuming job %s from frame %d", job.id, frames_processed)
+                self._executor.submit(self._run, job.id)
+        finally:
+            db.close()
+
+    def _renew_lease(self):
+        db = SessionLocal()
+
+        try:
+            db.execute(
+                update(Job)
+                .where(Job.owner == self.owner, Job.status.in_(ACTIVE_STATUSES))
+                .values(heartbeat_at=datetime.now(timezone.utc))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _watch(self):
+        while not self._stopped.wait(self.lease / 3):
+            try:
+                self._renew_lease()
+                self.resume_interrupted()
+            except Exception:
+                logger.exception("Job lease renewal failed")
+
+    def start(self):
+        """
+        Resume interrupted jobs, then keep renewing this manager's leases
+        and taking over the jobs of managers that stop renewing theirs.
+        """
+        self.resume_interrupted()
+
+        self._watcher = threading.Thread(
+            target=self._watch, name="aegis-job-lease", daemon=True
+        )
+        self._watcher.start()
+
+    def shutdown(self, wait=False):
+        self._stopped.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+job_manager = JobManager()
@@ -0,0 +1,134 @@
+# backend/services/segments.py
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import math
+
+from src.video_io import keyframe_indices, open_video, read_batches, release_video, seek_frame
+from src.model_registry import registry
+from backend.services.aegis_service import video_frame_count
+
+
+logger = logging.getLogger(__name__)
+
+
+# One detector per worker process, created by the pool initializer
+_worker_detector = None
+
+
+def _init_worker(detector=None):
+    global _worker_detector
+    # Kept for the life of the worker; the pool is per process
+    _worker_detector = detector if detector is not None else registry.pool().acquire()
+
+
+def _align_up(frame, keyframes, limit):
+    for k in keyframes:
+        if k >= frame:
+            return min(k, limit)
+    # No keyframe left to start a segment on
+    return limit + 1
+
+
+def plan_segments(frame_count, segments, keyframes=(), first=1):
+    """
+    Split frames first..frame_count into (start, end) ranges, end None
+    for the last one. With known keyframes, starts after the first are
+    moved onto keyframes, so a worker seeks straight to its range instead
+    of decoding the frames before it. Without them there is one segment.
+    """
+    if not keyframes:
+        return [(first, None)]
+
+    size = math.ceil((frame_count - first + 1) / segments)
+    starts = [first]
+
+    for k in range(1, segments):
+        start = first + k * size
+        if keyframes:
+            start = _align_up(start, keyframes, frame_count)
+        if start > starts[-1] and start <= frame_count:
+            starts.append(start)
+
+    return [
+        (start, starts[i + 1] - 1 if i + 1 < len(starts) else None)
+        for i, start in enumerate(starts)
+    ]
+
+
+def _detect_segment(video_path, start, end, keyframes, batch_size):
+    """Detections for frames start..end (to the last frame if end is None)."""
+    cap = open_video(video_path)
+    detections = []
+
+    try:
+        seek_frame(cap, start, keyframes)
+        frame_idx = start - 1
+
+        for frames in read_batches(cap, batch_size):
+            if end is not None:
+                frames = frames[:end - frame_idx]
+
+            detections.extend(_worker_detector.detect_batch(frames))
+            frame_idx += len(frames)
+
+            if end is not None and frame_idx >= end:
+                break
+    finally:
+        release_video(cap)
+
+    return detections
+
+
+def parallel_detections(video_path, workers, batch_size=8, first=1, segments=None,
+                        detector=None):
+    """
+    Yield (None, detections) for frames first.. of the video in order,
+    like the frame sources in aegis_service, with detection split into
+    keyframe-aligned segments across a process pool. Each worker loads
+    its own ObjectDetector, or gets a pickled copy of detector if given.
+
+    Only detection runs in the workers. Tracking, motion and risk need
+    every frame in order, so the caller runs them on what this yields,
+    each segment as soon as it and the ones before it are done; the
+    incidents are the same as a serial run in either motion mode.
+
+    The video is cut into `segments` pieces (default 4 per worker) so
+    workers that finish early pick up more. Each worker decodes only its
+    own segment. Videos whose keyframes cannot be read are detected as a
+    single segment, since a worker would otherwise have to decode every
+    frame before its start.
+    """
+    cap = open_video(video_path)
+    frame_count = video_frame_count(cap)
+    release_video(cap)
+
+    if first > frame_count:
+        return
+
+    keyframes = keyframe_indices(video_path)
+    if not keyframes:
+        logger.warning("No keyframe index for %s; detecting it in one process", video_path)
+
+    plan = deque(plan_segments(frame_count, segments or 4 * workers, keyframes, first))
+
+    pool = ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(detector,)
+    )
+    try:
+        # Segments are submitted a few at a time, so at most 2 * workers
+        # segments' detections are held while waiting to be consumed
+        running = deque()
+
+        while plan or running:
+            while plan and len(running) < 2 * workers:
+                start, end = plan.popleft()
+                running.append(
+                    pool.submit(_detect_segment, video_path, start, end, keyframes, batch_size)
+                )
+
+            for frame_detections in running.popleft().result():
+                yield None, frame_detections
+    finally:
+        pool.shutdown(cancel_futures=True)
@@ -0,0 +1,53 @@
+# backend/services/stats.py
+
+from datetime import datetime, timezone
+
+from sqlalchemy import func
+
+from backend.db.incident import Incident
+from backend.db.video import VideoSummary
+
+
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH")
+
+
+def risk_counts(db, video_id=None):
+    """Incidents per risk level from a single GROUP BY query."""
+    query = db.query(Incident.risk_level, func.count(Incident.id))
+
+    if video_id:
+        query = query.filter(Incident.video_id == video_id)
+
+    counts = dict.fromkeys(RISK_LEVELS, 0)
+    for level, count in query.group_by(Incident.risk_level):
+        if level in counts:
+            counts[level] = count
+
+    return counts
+
+
+def video_risk_counts(db, video_id):
+    """Per-video counts from the summary table, or computed if absent."""
+    summary = db.get(VideoSummary, video_id)
+
+    if summary is not None:
+        return {"LOW": summary.low, "MEDIUM": summary.medium, "HIGH": summary.high}
+
+    return risk_counts(db, video_id)
+
+
+def refresh_video_summary(db, video_id):
+    counts = risk_counts(db, video_id)
+
+    summary = db.get(VideoSummary, video_id)
+    if summary is None:
+        summary = VideoSummary(video_id=video_id)
+        db.add(summary)
+
+    summary.low = counts["LOW"]
+    summary.medium = counts["MEDIUM"]
+    summary.high = counts["HIGH"]
+    summary.total_incidents = sum(counts.values())
+    summary.updated_at = datetime.now(timezone.utc)
+
+    return summary
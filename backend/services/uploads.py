@@ -0,0 +1,145 @@
+# backend/services/uploads.py
+
+import hashlib
+import os
+import uuid
+
+from fastapi.concurrency import run_in_threadpool
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov")
+
+# Bytes gathered from the request before each disk write
+WRITE_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    pass
+
+
+class _FilePart:
+    """
+    MultipartParser callbacks that collect the bytes of one file field.
+    The parser fills `chunks` as it goes; the caller drains it after
+    each write to the parser.
+    """
+
+    def __init__(self, field):
+        self.field = field.encode()
+        self.filename = None
+        self.done = False
+        self.chunks = []
+
+        self._headers = {}
+        self._name = b""
+        self._value = b""
+        self._in_file = False
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._header_field,
+            "on_header_value": self._header_value,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def _part_begin(self):
+        self._headers = {}
+
+    def _header_field(self, data, start, end):
+        self._name += data[start:end]
+
+    def _header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def _header_end(self):
+        self._headers[self._name.lower()] = self._value
+        self._name = b""
+        self._value = b""
+
+    def _headers_finished(self):
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+
+        if params.get(b"name") == self.field and b"filename" in params and not self.done:
+            self.filename = params[b"filename"].decode("utf-8", "replace")
+            self._in_file = True
+
+    def _part_data(self, data, start, end):
+        if self._in_file:
+            self.chunks.append(bytes(data[start:end]))
+
+    def _part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self.done = True
+
+
+async def receive_upload(request, upload_dir, field="file"):
+    """
+    Stream the `field` file of a multipart/form-data request straight
+    from the socket into upload_dir, MD5-ing the bytes as they are
+    written. The body is read once and never spooled elsewhere first.
+
+    Returns (filename, path, md5 hex digest). Raises UploadError for a
+    body that is not multipart, has no such file, or is not a video;
+    nothing is left on disk then.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError("Expected a multipart/form-data upload")
+
+    part = _FilePart(field)
+    parser = MultipartParser(params[b"boundary"], part.callbacks())
+    hasher = hashlib.md5()
+
+    out = None
+    path = None
+    pending = bytearray()
+
+    async def flush():
+        hasher.update(pending)
+        await run_in_threadpool(out.write, bytes(pending))
+        pending.clear()
+
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except MultipartParseError as e:
+                raise UploadError(f"Malformed multipart body: {e}")
+
+            if part.filename is not None and out is None:
+                if not part.filename.endswith(VIDEO_EXTENSIONS):
+                    raise UploadError("Invalid file format")
+
+                # Unique name: the file lives until its job has run
+                path = os.path.join(
+                    upload_dir, f"{uuid.uuid4().hex}_{os.path.basename(part.filename)}"
+                )
+                out = open(path, "wb")
+
+            for data in part.chunks:
+                pending += data
+            part.chunks.clear()
+
+            if len(pending) >= WRITE_CHUNK_SIZE:
+                await flush()
+
+        parser.finalize()
+        if not part.done:
+            raise UploadError(f"No '{field}' file in the upload")
+
+        await flush()
+    except BaseException:
+        if out is not None:
+            out.close()
+            os.remove(path)
+        raise
+
+    out.close()
+    return part.filename, path, hasher.hexdigest()
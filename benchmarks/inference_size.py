@@ -0,0 +1,118 @@
+"""
+inference_size.py — Detector latency vs accuracy at several inference sizes.
+
+Accuracy is measured against the largest size. Recall is the share of
+reference boxes found again (same class, IoU >= --iou); precision is the
+share of boxes that match a reference box.
+
+Usage:
+    python -m benchmarks.inference_size <video> [--sizes 320 416 512 640 960]
+
+Examples:
+    python -m benchmarks.inference_size data/videos/test_near_miss.mp4
+    python -m benchmarks.inference_size clip.mp4 --backend onnx --sizes 320 480 640
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from src.detection import ObjectDetector
+from src.inference import BACKENDS, match_detections
+from src.video_io import sample_frames
+
+
+def time_detector(detector, frames, repeat):
+    """Per-frame detect() latencies in milliseconds, after one warm-up pass."""
+    detections = [detector.detect(frame) for frame in frames]
+
+    latencies = []
+    for _ in range(repeat):
+        for frame in frames:
+            start = time.perf_counter()
+            detector.detect(frame)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    return detections, np.array(latencies)
+
+
+def run(video, sizes, model_path="yolov8n.pt", backend="torch", frames=32, repeat=3,
+        iou=0.5, threads=None, conf_threshold=0.4):
+    sampled = sample_frames(video, frames)
+    if not sampled:
+        raise RuntimeError(f"No frames read from {video}")
+
+    results = {}
+    for size in sorted(sizes, reverse=True):
+        detector = ObjectDetector(model_path, conf_threshold=conf_threshold,
+                                  backend=backend, threads=threads, imgsz=size)
+        detections, latencies = time_detector(detector, sampled, repeat)
+        results[size] = (detections, latencies)
+
+    reference = results[max(sizes)][0]
+    rows = []
+    for size in sorted(sizes):
+        detections, latencies = results[size]
+        report = match_detections(reference, detections, iou)
+        found = report["matched"] + report["unmatched_candidate_boxes"]
+
+        rows.append({
+            "imgsz": size,
+            "mean_ms": round(float(latencies.mean()), 2),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p90_ms": round(float(np.percentile(latencies, 90)), 2),
+            "fps": round(1000 / float(latencies.mean()), 1),
+            "boxes": found,
+            "recall": round(report["match_rate"], 3),
+            "precision": round(report["matched"] / found, 3) if found else 1.0,
+        })
+
+    return {
+        "video": video,
+        "frame_shape": list(sampled[0].shape),
+        "frames": len(sampled),
+        "backend": backend,
+        "reference_imgsz": max(sizes),
+        "rows": rows,
+    }
+
+
+def print_table(result):
+    print(f"{result['video']}  {result['frames']} frames {result['frame_shape']}  "
+          f"backend={result['backend']}  reference={result['reference_imgsz']}")
+    print(f"{'imgsz':>6} {'mean ms':>8} {'p50 ms':>8} {'p90 ms':>8} {'fps':>7} "
+          f"{'boxes':>6} {'recall':>7} {'precision':>9}")
+
+    for row in result["rows"]:
+        print(f"{row['imgsz']:>6} {row['mean_ms']:>8} {row['p50_ms']:>8} {row['p90_ms']:>8} "
+              f"{row['fps']:>7} {row['boxes']:>6} {row['recall']:>7} {row['precision']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark detector latency and accuracy at several inference sizes."
+    )
+    parser.add_argument("video", help="Video to sample frames from")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[320, 416, 512, 640, 960])
+    parser.add_argument("--model", default="yolov8n.pt", help="PyTorch weights")
+    parser.add_argument("--backend", default="torch", choices=BACKENDS)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--frames", type=int, default=32, help="Frames to sample")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the frames")
+    parser.add_argument("--iou", type=float, default=0.5, help="Match IoU threshold")
+    parser.add_argument("--json", default=None, help="Also write the results here")
+    args = parser.parse_args()
+
+    result = run(args.video, args.sizes, args.model, args.backend, args.frames,
+                 args.repeat, args.iou, args.threads)
+    print_table(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
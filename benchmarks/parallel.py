@@ -0,0 +1,150 @@
+"""
+parallel.py — Parity and speed-up check for multi-process analysis.
+
+Renders a deterministic synthetic scene (see scenes.py) to a video, runs
+analyze_video on it serially and with --workers processes, and checks
+that both return the same incidents, in each motion mode. Prints the
+wall time of each run and the speed-up; the exit code is 1 if any
+parallel run differs from the serial one, or is less than --min-speedup
+times faster.
+
+The video is written as MPEG-4 (mp4v) by default, so most frames are not
+keyframes and segments have to start on the keyframes between them.
+
+Detection runs on the CPU with every backend, so the speed-up is capped
+by the cores available; on one core the parallel run can only match the
+serial one. --detect-ms adds a per-frame wait to the colour detector to
+model a detector bound by an accelerator instead. Run it with --detector
+yolo on the target machine before raising AEGIS_SEGMENT_WORKERS.
+
+Usage:
+    python -m benchmarks.parallel [--frames 600] [--workers 4]
+                                  [--detector color|yolo] [--codec mp4v]
+                                  [--detect-ms 0] [--min-speedup 0]
+
+Examples:
+    python -m benchmarks.parallel
+    python -m benchmarks.parallel --detect-ms 20
+    python -m benchmarks.parallel --detector yolo --workers 8 --frames 3000 --min-speedup 1.5
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+
+# backend.db.session builds an engine from DATABASE_URL on import
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from backend.services.aegis_service import analyze_video
+from benchmarks.scenes import SyntheticScene, ColorDetector
+
+
+MOTION_MODES = ("active_pair", "all_pairs")
+
+
+def write_scene(path, scene, frames, codec, fps=30):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, scene.size)
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open a {codec} video writer for {path}")
+
+    for i in range(frames):
+        writer.write(scene.frame(i))
+    writer.release()
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run(video_path, workers, detector=None, motion_modes=MOTION_MODES, batch_size=8):
+    """
+    One row per motion mode: incident counts, wall times and whether the
+    parallel incidents equal the serial ones.
+    """
+    rows = []
+
+    for mode in motion_modes:
+        serial, serial_time = timed(
+            analyze_video, video_path, batch_size=batch_size, pipelined=False,
+            motion_mode=mode, detector=detector
+        )
+        parallel, parallel_time = timed(
+            analyze_video, video_path, batch_size=batch_size, motion_mode=mode,
+            workers=workers, detector=detector
+        )
+
+        rows.append({
+            "motion_mode": mode,
+            "incidents": len(serial),
+            "parallel_incidents": len(parallel),
+            "serial_s": serial_time,
+            "parallel_s": parallel_time,
+            "match": parallel == serial,
+        })
+
+    return rows
+
+
+def print_table(rows, workers):
+    print(f"{workers} workers on {len(os.sched_getaffinity(0))} available CPUs")
+    print(f"{'motion_mode':<12} {'incidents':>9} {'serial_s':>9} "
+          f"{f'{workers}_workers_s':>11} {'speedup':>8}  match")
+
+    for r in rows:
+        incidents = str(r["incidents"])
+        if r["parallel_incidents"] != r["incidents"]:
+            incidents += f"/{r['parallel_incidents']}"
+
+        print(f"{r['motion_mode']:<12} {incidents:>9} {r['serial_s']:>9.2f} "
+              f"{r['parallel_s']:>11.2f} {r['serial_s'] / r['parallel_s']:>7.2f}x  "
+              f"{'yes' if r['match'] else 'NO'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that multi-process analysis matches a serial run."
+    )
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--people", type=int, default=8)
+    parser.add_argument("--vehicles", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--codec", default="mp4v", help="FourCC of the rendered video")
+    parser.add_argument("--detector", default="color", choices=("color", "yolo"),
+                        help="color finds the scene's boxes by colour instead of a model")
+    parser.add_argument("--detect-ms", type=float, default=0,
+                        help="Extra wait per frame in the colour detector")
+    parser.add_argument("--min-speedup", type=float, default=0,
+                        help="Fail if a parallel run is not this many times faster")
+    parser.add_argument("--motion-mode", default=None, choices=MOTION_MODES,
+                        help="Only check this mode (default: both)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    scene = SyntheticScene(args.people, args.vehicles, seed=args.seed)
+    detector = ColorDetector(latency_ms=args.detect_ms) if args.detector == "color" else None
+    modes = (args.motion_mode,) if args.motion_mode else MOTION_MODES
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "scene.mp4" if args.codec == "mp4v" else "scene.avi")
+        write_scene(video_path, scene, args.frames, args.codec)
+
+        rows = run(video_path, args.workers, detector, modes, args.batch_size)
+
+    print_table(rows, args.workers)
+
+    if not all(r["match"] for r in rows):
+        sys.exit(1)
+    if any(r["serial_s"] / r["parallel_s"] < args.min_speedup for r in rows):
+        print(f"\nspeed-up below {args.min_speedup}x")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
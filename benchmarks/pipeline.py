@@ -0,0 +1,411 @@
+"""
+pipeline.py — Per-stage and end-to-end benchmark of the AEGIS pipeline.
+
+Renders a deterministic synthetic scene (see scenes.py) to a video and
+times each stage on its own, then analyze_video end to end:
+
+    decode      read_frame on the rendered video
+    detect      ObjectDetector.detect (skipped with --detector scripted)
+    track       ArrayCentroidTracker.update_store on the scene's ground-truth boxes
+    motion      RelativeMotionAnalyzer.analyze_store, or analyze_all_pairs
+                with --motion-mode all_pairs, on the tracker's store
+    nmrs        NearMissRiskModel on the motion output (compute_nmrs, or
+                compute_nmrs_arrays for all_pairs)
+    db_write    save_incidents + commit into a scratch SQLite database
+    end_to_end  analyze_video over the whole video
+
+track, motion and nmrs run frame by frame in one loop, the way
+FrameAnalyzer chains them, and each call is timed on its own.
+
+Each stage reports frames per second and mean/p50/p99 per-item latency,
+except end_to_end: its mean is the wall time per frame, but frames are
+decoded and detected in batches, so the gaps between its progress
+callbacks are not per-frame latencies. They are reported separately as
+p50_gap_ms/p99_gap_ms (mostly near zero, with one long gap per batch)
+and are not compared against a baseline.
+Results can be saved as JSON and compared against an earlier run; the
+exit code is 1 when a stage is slower than the baseline by more than
+--tolerance.
+
+Usage:
+    python -m benchmarks.pipeline [--frames 300] [--people 6] [--vehicles 4]
+                                  [--detector yolo|scripted] [--json out.json]
+                                  [--baseline old.json] [--tolerance 0.1]
+
+Examples:
+    python -m benchmarks.pipeline --json benchmarks/baseline.json
+    python -m benchmarks.pipeline --detector scripted --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+# backend.db.session builds an engine from DATABASE_URL on import; the
+# DB stage writes to its own scratch database either way
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.db.incident import Incident
+from backend.services.aegis_service import H, analyze_video
+from backend.services.jobs import save_incidents
+from benchmarks.scenes import SyntheticScene, ScriptedDetector
+from src.motion import RelativeMotionAnalyzer
+from src.risk_model import NearMissRiskModel
+from src.tracking import ArrayCentroidTracker
+from src.video_io import open_video, read_frame, release_video
+
+
+STAGES = ("decode", "detect", "track", "motion", "nmrs", "db_write", "end_to_end")
+
+
+def summarize(latencies_ms, unit="frames"):
+    """Throughput and latency percentiles for one stage."""
+    lat = np.asarray(latencies_ms, dtype=np.float64)
+    total = lat.sum() / 1000
+
+    return {
+        unit: int(len(lat)),
+        "total_s": round(float(total), 4),
+        "fps": round(len(lat) / total, 1) if total > 0 else None,
+        "mean_ms": round(float(lat.mean()), 4),
+        "p50_ms": round(float(np.percentile(lat, 50)), 4),
+        "p99_ms": round(float(np.percentile(lat, 99)), 4),
+    }
+
+
+def _timed(fn, items):
+    """fn(item) for each item; returns (results, latencies in ms)."""
+    results, latencies = [], []
+
+    for item in items:
+        start = time.perf_counter()
+        results.append(fn(item))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return results, latencies
+
+
+# -------------------------------
+# STAGES
+# -------------------------------
+def bench_decode(video_path, keep):
+    """Decode the whole video; the first `keep` frames are returned."""
+    cap = open_video(video_path)
+    frames, latencies = [], []
+
+    while True:
+        start = time.perf_counter()
+        ret, frame = read_frame(cap)
+        elapsed = (time.perf_counter() - start) * 1000
+        if not ret:
+            break
+
+        latencies.append(elapsed)
+        if len(frames) < keep:
+            frames.append(frame)
+
+    release_video(cap)
+    return summarize(latencies), frames
+
+
+def bench_detect(detector, frames):
+    # First call builds the graph; it is not part of the steady state
+    detector.detect(frames[0])
+    _, latencies = _timed(detector.detect, frames)
+    return summarize(latencies)
+
+
+def _lap(start, latencies):
+    now = time.perf_counter()
+    latencies.append((now - start) * 1000)
+    return now
+
+
+def bench_analysis(scene, frames, fps, mode):
+    """
+    Track, motion and NMRS summaries, using the array tracker and the
+    store-based motion calls of FrameAnalyzer.process.
+    """
+    streams = [scene.detections(i) for i in range(frames)]
+    tracker = ArrayCentroidTracker()
+    analyzer = RelativeMotionAnalyzer(H, mode=mode)
+    model = NearMissRiskModel()
+
+    track_ms, motion_ms, nmrs_ms = [], [], []
+
+    for frame_idx, detections in enumerate(streams, start=1):
+        start = time.perf_counter()
+        store = tracker.update_store(detections)
+        start = _lap(start, track_ms)
+
+        if mode == "all_pairs":
+            cols = analyzer.analyze_all_pairs(store, frame_idx, fps)
+            start = _lap(start, motion_ms)
+
+            if cols is not None:
+                model.compute_nmrs_arrays(cols["distance"], cols["relative_velocity"],
+                                          cols["ttc"])
+        else:
+            motion = analyzer.analyze_store(store, frame_idx, fps)
+            start = _lap(start, motion_ms)
+
+            model.compute_nmrs(motion)
+        _lap(start, nmrs_ms)
+
+    return summarize(track_ms), summarize(motion_ms), summarize(nmrs_ms)
+
+
+def _incident_rows(incidents, rows):
+    if not incidents:
+        incidents = [{
+            "object_1": "person_0", "object_2": "vehicle_1", "distance_m": 1.5,
+            "ttc_seconds": 0.8, "relative_velocity": 2.0, "nmrs_score": 0.75,
+            "risk_level": "HIGH", "frame_number": 1
+        }]
+    return [incidents[i % len(incidents)] for i in range(rows)]
+
+
+def bench_db_write(incidents, rows, repeat):
+    """save_incidents of `rows` incidents per call into a file-backed SQLite DB."""
+    batch = _incident_rows(incidents, rows)
+    summaries = [None] * len(batch)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Incident.__table__.create(engine)
+        Session = sessionmaker(bind=engine)
+
+        def write(i):
+            with Session() as db:
+                save_incidents(db, f"bench-{i}", "benchmark", batch, summaries)
+                db.commit()
+
+        _, latencies = _timed(write, range(repeat))
+        engine.dispose()
+
+    result = summarize(latencies, unit="writes")
+    result.pop("fps")
+    result["rows_per_write"] = rows
+    result["rows_per_s"] = round(rows * repeat / result["total_s"], 1)
+    return result
+
+
+def bench_end_to_end(video_path, detector, batch_size):
+    stamps = []
+    start = time.perf_counter()
+
+    def progress(frames_processed, frames_total):
+        stamps.append(time.perf_counter())
+
+    incidents = analyze_video(video_path, batch_size=batch_size, detector=detector,
+                              progress=progress)
+
+    gaps = np.diff([start] + stamps) * 1000
+    result = summarize(gaps)
+    result["p50_gap_ms"] = result.pop("p50_ms")
+    result["p99_gap_ms"] = result.pop("p99_ms")
+    result["incidents"] = len(incidents)
+    return result, incidents
+
+
+# -------------------------------
+# RUN / COMPARE
+# -------------------------------
+def _environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+
+
+def run(frames=300, people=6, vehicles=4, size=(640, 480), seed=0, fps=30,
+        detector="yolo", model_path="yolov8n.pt", backend="torch", imgsz=640,
+        detect_frames=50, motion_mode="active_pair", batch_size=8, db_rows=500,
+        db_repeat=20):
+    scene = SyntheticScene(people, vehicles, size, seed)
+    stages = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "scene.avi")
+        scene.write_video(video_path, frames, fps)
+
+        stages["decode"], sample = bench_decode(video_path, detect_frames)
+
+        if detector == "yolo":
+            from src.detection import ObjectDetector
+            model = ObjectDetector(model_path, backend=backend, imgsz=imgsz)
+            stages["detect"] = bench_detect(model, sample)
+        else:
+            model = ScriptedDetector(scene)
+            stages["detect"] = None
+
+        stages["track"], stages["motion"], stages["nmrs"] = bench_analysis(
+            scene, frames, fps, motion_mode
+        )
+
+        stages["end_to_end"], incidents = bench_end_to_end(video_path, model, batch_size)
+
+    stages["db_write"] = bench_db_write(incidents, db_rows, db_repeat)
+
+    return {
+        "config": {
+            "frames": frames, "people": people, "vehicles": vehicles,
+            "size": list(size), "seed": seed, "fps": fps, "detector": detector,
+            "model": model_path if detector == "yolo" else None, "backend": backend,
+            "imgsz": imgsz, "detect_frames": detect_frames, "motion_mode": motion_mode,
+            "batch_size": batch_size, "db_rows": db_rows, "db_repeat": db_repeat,
+        },
+        "environment": _environment(),
+        "stages": {name: stages[name] for name in STAGES},
+    }
+
+
+def compare(result, baseline, tolerance=0.1):
+    """
+    Per-stage change against a baseline run. A stage regresses when its
+    mean or p99 latency grows by more than `tolerance` (a fraction);
+    stages without a p99 latency (end_to_end) are judged on the mean.
+    Returns (rows, regressed stage names).
+    """
+    rows, regressed = [], []
+
+    for name in STAGES:
+        now = result["stages"].get(name)
+        before = baseline["stages"].get(name)
+        if not now or not before:
+            continue
+
+        mean_change = now["mean_ms"] / before["mean_ms"] - 1 if before["mean_ms"] else 0.0
+        p99_change = 0.0
+        if now.get("p99_ms") and before.get("p99_ms"):
+            p99_change = now["p99_ms"] / before["p99_ms"] - 1
+        slower = mean_change > tolerance or p99_change > tolerance
+
+        rows.append({
+            "stage": name,
+            "mean_ms": (before["mean_ms"], now["mean_ms"]),
+            "mean_change": round(mean_change, 3),
+            "p99_change": round(p99_change, 3),
+            "regressed": slower,
+        })
+        if slower:
+            regressed.append(name)
+
+    return rows, regressed
+
+
+def print_table(result):
+    config = result["config"]
+    print(f"{config['frames']} frames {config['size'][0]}x{config['size'][1]}, "
+          f"{config['people']} people, {config['vehicles']} vehicles, "
+          f"seed {config['seed']}, detector={config['detector']}")
+    print(f"{'stage':<11} {'items':>6} {'fps':>9} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+
+    for name in STAGES:
+        stage = result["stages"][name]
+        if stage is None:
+            print(f"{name:<11} {'skipped':>6}")
+            continue
+
+        items = stage.get("frames", stage.get("writes"))
+        fps = stage.get("fps", "-")
+        p50 = f"{stage['p50_ms']:>9.3f}" if "p50_ms" in stage else f"{'-':>9}"
+        p99 = f"{stage['p99_ms']:>9.3f}" if "p99_ms" in stage else f"{'-':>9}"
+        print(f"{name:<11} {items:>6} {fps:>9} {stage['mean_ms']:>9.3f} {p50} {p99}")
+
+    end_to_end = result["stages"]["end_to_end"]
+    print(f"end_to_end mean is wall time per frame; progress gaps p50 "
+          f"{end_to_end['p50_gap_ms']:.3f} ms, p99 {end_to_end['p99_gap_ms']:.3f} ms "
+          f"(batched, not per-frame latency)")
+
+
+def print_comparison(rows, baseline):
+    print(f"\nvs baseline {baseline['environment'].get('commit') or ''}")
+    print(f"{'stage':<11} {'base ms':>9} {'now ms':>9} {'mean':>8} {'p99':>8}")
+
+    for row in rows:
+        before, now = row["mean_ms"]
+        flag = "  SLOWER" if row["regressed"] else ""
+        print(f"{row['stage']:<11} {before:>9.3f} {now:>9.3f} "
+              f"{row['mean_change']:>+8.1%} {row['p99_change']:>+8.1%}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark each AEGIS pipeline stage on a synthetic scene."
+    )
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--people", type=int, default=6)
+    parser.add_argument("--vehicles", type=int, default=4)
+    parser.add_argument("--size", type=int, nargs=2, default=[640, 480],
+                        metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--detector", default="yolo", choices=("yolo", "scripted"),
+                        help="scripted replays the scene's ground truth instead of a model")
+    parser.add_argument("--model", default="yolov8n.pt", help="PyTorch weights")
+    parser.add_argument("--backend", default="torch", help="Inference backend")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--detect-frames", type=int, default=50,
+                        help="Frames timed in the detect stage")
+    parser.add_argument("--motion-mode", default="active_pair",
+                        choices=("active_pair", "all_pairs"))
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--db-rows", type=int, default=500, help="Incidents per DB write")
+    parser.add_argument("--db-repeat", type=int, default=20, help="Timed DB writes")
+    parser.add_argument("--json", default=None, help="Write the results here")
+    parser.add_argument("--baseline", default=None, help="Earlier --json output to compare")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Allowed slowdown before a stage counts as regressed")
+    args = parser.parse_args()
+
+    result = run(
+        args.frames, args.people, args.vehicles, tuple(args.size), args.seed,
+        detector=args.detector, model_path=args.model, backend=args.backend,
+        imgsz=args.imgsz, detect_frames=args.detect_frames, motion_mode=args.motion_mode,
+        batch_size=args.batch_size, db_rows=args.db_rows, db_repeat=args.db_repeat
+    )
+    print_table(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        if baseline["config"] != result["config"]:
+            print("\nwarning: baseline was run with a different configuration")
+
+        rows, regressed = compare(result, baseline, args.tolerance)
+        print_comparison(rows, baseline)
+
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+resume.py — Check that a resumed analysis matches an uninterrupted one.
+
+Renders a deterministic synthetic scene (see scenes.py) and encodes it
+as long-GOP H.264 with B-frames, where a plain frame seek is most likely
+to land on the wrong frame. For each motion mode and interruption point
+it analyzes the clip with a checkpoint, stops it partway, resumes from
+the checkpoint and compares the incidents with an uninterrupted run. The
+exit code is 1 if any resumed run differs.
+
+Checkpoints are taken every --checkpoint-every frames, which by default
+does not divide the GOP, so most resumes start between keyframes.
+
+Encoding needs the ffmpeg binary with libx264 (see trim_video.py).
+
+Usage:
+    python -m benchmarks.resume [--frames 600] [--gop 120]
+                                [--checkpoint-every 45] [--stop-at 100 250 430]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+# backend.db.session builds an engine from DATABASE_URL on import
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from backend.services.aegis_service import analyze_video
+from benchmarks.parallel import MOTION_MODES, write_scene
+from benchmarks.scenes import SyntheticScene, ColorDetector
+
+
+class Interrupted(Exception):
+    pass
+
+
+def write_h264(path, scene, frames, gop, fps=30):
+    import ffmpeg
+
+    raw = path + ".mp4v.mp4"
+    write_scene(raw, scene, frames, "mp4v", fps)
+    try:
+        (
+            ffmpeg
+            .input(raw)
+            .output(path, vcodec="libx264", g=gop, bf=3, pix_fmt="yuv420p")
+            .overwrite_output()
+            .run(quiet=True)
+        )
+    finally:
+        os.remove(raw)
+
+
+def interrupted_run(video_path, checkpoint, stop_at, checkpoint_every, **options):
+    """Analyze until frame stop_at, as if the process died there."""
+    def progress(frames_processed, frames_total):
+        if frames_processed >= stop_at:
+            raise Interrupted
+
+    try:
+        analyze_video(video_path, progress=progress, checkpoint=checkpoint,
+                      checkpoint_every=checkpoint_every, **options)
+    except Interrupted:
+        return
+    raise RuntimeError(f"Analysis ended before frame {stop_at}")
+
+
+def run(video_path, stop_points, checkpoint_every, motion_modes=MOTION_MODES):
+    rows = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in motion_modes:
+            options = {"motion_mode": mode, "detector": ColorDetector()}
+            expected = analyze_video(video_path, **options)
+
+            for stop_at in stop_points:
+                checkpoint = os.path.join(tmp, f"{mode}-{stop_at}.json")
+                interrupted_run(video_path, checkpoint, stop_at, checkpoint_every, **options)
+
+                resumed = analyze_video(video_path, checkpoint=checkpoint,
+                                        checkpoint_every=checkpoint_every, **options)
+
+                rows.append({
+                    "motion_mode": mode,
+                    "stop_at": stop_at,
+                    "resumed_from": stop_at // checkpoint_every * checkpoint_every,
+                    "incidents": len(expected),
+                    "match": resumed == expected,
+                })
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check that resuming from a checkpoint matches an uninterrupted run."
+    )
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--people", type=int, default=8)
+    parser.add_argument("--vehicles", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--gop", type=int, default=120, help="Frames between keyframes")
+    parser.add_argument("--checkpoint-every", type=int, default=45)
+    parser.add_argument("--stop-at", type=int, nargs="+", default=[100, 250, 430],
+                        help="Frames at which to interrupt the analysis")
+    args = parser.parse_args()
+
+    scene = SyntheticScene(args.people, args.vehicles, seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video_path = os.path.join(tmp, "scene.mp4")
+        write_h264(video_path, scene, args.frames, args.gop)
+
+        rows = run(video_path, args.stop_at, args.checkpoint_every)
+
+    print(f"{'motion_mode':<12} {'stop_at':>7} {'resumed':>7} {'incidents':>9}  match")
+    for r in rows:
+        print(f"{r['motion_mode']:<12} {r['stop_at']:>7} {r['resumed_from']:>7} "
+              f"{r['incidents']:>9}  {'yes' if r['match'] else 'NO'}")
+
+    if not all(r["match"] for r in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+scenes.py — Deterministic synthetic traffic scenes for the benchmarks.
+
+A scene is a seeded set of vehicles driving along horizontal lanes and
+people crossing them vertically, so person/vehicle pairs keep closing in
+and near misses happen. Each frame can be rendered to an image or read
+as the ground-truth detection list ObjectDetector would return, and the
+same seed always gives the same frames and detections.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+
+PERSON_SIZE = (18, 44)
+VEHICLE_SIZE = (70, 34)
+
+PERSON_COLOR = (40, 40, 200)
+VEHICLE_COLOR = (200, 120, 30)
+
+
+class SyntheticScene:
+    def __init__(self, people=6, vehicles=4, size=(640, 480), seed=0):
+        self.people = people
+        self.vehicles = vehicles
+        self.size = size
+        self.seed = seed
+
+        rng = np.random.default_rng(seed)
+        w, h = size
+
+        # Road band in the lower half, where the homography is calibrated
+        lanes = np.linspace(h * 0.55, h * 0.9, max(vehicles, 1))
+        self._vehicles = [
+            {
+                "x": rng.uniform(0, w), "y": lanes[i],
+                "vx": rng.choice([-1, 1]) * rng.uniform(3, 8), "vy": 0.0
+            }
+            for i in range(vehicles)
+        ]
+        self._people = [
+            {
+                "x": rng.uniform(w * 0.1, w * 0.9), "y": rng.uniform(h * 0.45, h * 0.95),
+                "vx": 0.0, "vy": rng.choice([-1, 1]) * rng.uniform(1, 3)
+            }
+            for _ in range(people)
+        ]
+
+        # Static textured background so decode and resize do real work
+        background = rng.integers(90, 130, (h, w, 3), dtype=np.uint8)
+        background[int(h * 0.5):] //= 2
+        for y in lanes[:-1]:
+            cv2.line(background, (0, int(y + 20)), (w, int(y + 20)), (200, 200, 200), 2)
+        self._background = cv2.GaussianBlur(background, (3, 3), 0)
+
+    def _position(self, obj, axis, speed, frame_idx, low, high):
+        # Objects bounce between low and high along their direction of travel
+        span = high - low
+        p = (obj[axis] - low + obj[speed] * frame_idx) % (2 * span)
+        return low + (p if p < span else 2 * span - p)
+
+    def _boxes(self, frame_idx):
+        w, h = self.size
+
+        for obj in self._vehicles:
+            x = self._position(obj, "x", "vx", frame_idx, 0, w)
+            yield "vehicle", x, obj["y"], VEHICLE_SIZE
+
+        for obj in self._people:
+            y = self._position(obj, "y", "vy", frame_idx, h * 0.45, h * 0.95)
+            yield "person", obj["x"], y, PERSON_SIZE
+
+    def detections(self, frame_idx):
+        """Ground-truth detections for frame_idx, in ObjectDetector's format."""
+        w, h = self.size
+        out = []
+
+        for cls, cx, cy, (bw, bh) in self._boxes(frame_idx):
+            x1, y1 = max(0, int(cx - bw / 2)), max(0, int(cy - bh / 2))
+            x2, y2 = min(w, int(cx + bw / 2)), min(h, int(cy + bh / 2))
+            out.append({"class": cls, "confidence": 0.9, "bbox": [x1, y1, x2, y2]})
+
+        return out
+
+    def frame(self, frame_idx):
+        """Rendered BGR image of frame_idx."""
+        image = self._background.copy()
+
+        for det in self.detections(frame_idx):
+            x1, y1, x2, y2 = det["bbox"]
+            color = PERSON_COLOR if det["class"] == "person" else VEHICLE_COLOR
+            cv2.rectangle(image, (x1, y1), (x2, y2), color, -1)
+            cv2.rectangle(image, (x1, y1), (x2, y2), (20, 20, 20), 1)
+
+        return image
+
+    def write_video(self, path, frames, fps=30):
+        """Render `frames` frames into an MJPEG AVI at path."""
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, self.size)
+        if not writer.isOpened():
+            raise RuntimeError(f"Could not open video writer for {path}")
+
+        for i in range(frames):
+            writer.write(self.frame(i))
+        writer.release()
+
+
+class ScriptedDetector:
+    """
+    Stands in for ObjectDetector by replaying a scene's ground truth, one
+    frame per call in order. Lets the rest of the pipeline be timed
+    without model weights or inference noise.
+    """
+
+    def __init__(self, scene):
+        self.scene = scene
+        self.frame_idx = 0
+
+    def detect(self, frame):
+        detections = self.scene.detections(self.frame_idx)
+        self.frame_idx += 1
+        return detections
+
+    def detect_batch(self, frames):
+        return [self.detect(frame) for frame in frames]
+
+
+class ColorDetector:
+    """
+    Finds a scene's boxes by their fill colour in the decoded frame.
+    Unlike ScriptedDetector the result depends only on the frame, not on
+    call order, so copies of it can run in separate worker processes.
+    Boxes that overlap come back merged.
+
+    latency_ms adds a sleep per frame, standing in for a model that waits
+    on an accelerator rather than the CPU.
+    """
+
+    def __init__(self, tolerance=40, min_area=40, latency_ms=0):
+        self.tolerance = tolerance
+        self.min_area = min_area
+        self.latency_ms = latency_ms
+
+    def _boxes(self, frame, color, cls):
+        color = np.array(color, dtype=np.int16)
+        mask = cv2.inRange(
+            frame,
+            np.clip(color - self.tolerance, 0, 255).astype(np.uint8),
+            np.clip(color + self.tolerance, 0, 255).astype(np.uint8)
+        )
+        _, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+
+        return [
+            {"class": cls, "confidence": 0.9, "bbox": [int(x), int(y), int(x + w), int(y + h)]}
+            for x, y, w, h, area in stats[1:].tolist()
+            if area >= self.min_area
+        ]
+
+    def detect(self, frame):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        return (
+            self._boxes(frame, PERSON_COLOR, "person")
+            + self._boxes(frame, VEHICLE_COLOR, "vehicle")
+        )
+
+    def detect_batch(self, frames):
+        return [self.detect(frame) for frame in frames]
@@ -1,6 +1,10 @@
 import cv2
 import numpy as np
 
+from src.roi import save_roi
+
+ROI_PATH = "data/roi.json"
+
 # Load your video
 cap = cv2.VideoCapture("data/videos/test_near_miss.mp4")
 
@@ -78,4 +82,11 @@ world_points = np.array([
 H, _ = cv2.findHomography(image_points, world_points)
 
 print("\n✅ COPY THIS MATRIX:\n")
-print(H)
\ No newline at end of file
+print(H)
+
+# Road polygon in full-frame pixels (clicks were on the scaled preview),
+# used as a static ROI mask for motion-gated detection
+top_left, top_right, bottom_left, bottom_right = image_points / scale
+save_roi(ROI_PATH, [top_left, top_right, bottom_right, bottom_left],
+         (frame.shape[1], frame.shape[0]))
+print(f"\nROI saved to {ROI_PATH}")
\ No newline at end of file
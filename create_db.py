@@ -1,7 +1,27 @@
+from sqlalchemy import inspect, text
+
 from backend.db.session import engine
 from backend.db.base import Base
 from backend.db.incident import Incident
+from backend.db.job import Job
+from backend.db.video import Video, VideoSummary
 
 Base.metadata.create_all(bind=engine)
 
+# create_all skips tables that already exist; add any new columns and
+# indexes to them (new columns are nullable, so no backfill is needed)
+existing = inspect(engine)
+for table in Base.metadata.sorted_tables:
+    columns = {c["name"] for c in existing.get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in columns:
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                ))
+
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
 print("Tables created successfully")
\ No newline at end of file
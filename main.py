@@ -1,26 +1,74 @@
 import cv2
-import time
-import requests
-import random
+import logging
+import math
+import os
 
-from src.video_io import open_video, read_frame, release_video
+from src.video_io import open_decoder, read_frame, release_video
 from src.detection import ObjectDetector
 from src.tracking import CentroidTracker
 from src.motion import RelativeMotionAnalyzer
-from src.risk_model import NearMissRiskModel, NearMissEventDetector
+from src.risk_model import NearMissRiskModel, NearMissEventDetector, risk_level
 from src.visualization import SignalLogger
+from src.telemetry import TelemetryClient
+from src.scheduler import DetectionScheduler
+from src.roi import MotionGate, GatedDetector, load_roi
+from src.metrics import metrics
+
+
+TELEMETRY_URL = "http://127.0.0.1:8000/analyze/batch"
+SEND_EVERY = 10
+ROI_PATH = "data/roi.json"
+
+log = logging.getLogger("aegis.main")
+
+
+def event_record(e, frame_number):
+    """Dashboard record for one scored person-vehicle pair."""
+    ttc = e["ttc"]
+    return {
+        "object_1": f"person_{e['person_id']}",
+        "object_2": f"vehicle_{e['vehicle_id']}",
+        "distance": round(float(e["distance"]), 2),
+        "relative_velocity": round(float(e["relative_velocity"]), 2),
+        "ttc": round(float(ttc), 2) if math.isfinite(ttc) else None,
+        "nmrs": round(float(e["nmrs"]), 2),
+        "risk_level": risk_level(e["nmrs"], e["near_miss"]),
+        "frame_number": frame_number,
+        "ai_summary": "Real-time event detected"
+    }
 
 
 def main():
-    cap = open_video("data/videos/test_near_miss.mp4")
+    logging.basicConfig(level=os.getenv("AEGIS_LOG_LEVEL", "INFO"))
 
+    # Prometheus scrape target for this process, e.g. AEGIS_METRICS_PORT=9100
+    metrics_port = os.getenv("AEGIS_METRICS_PORT")
+    if metrics_port:
+        metrics.serve(int(metrics_port))
+
+    # Resized on read into one reused frame buffer, with the same
+    # interpolation as a plain cv2.resize
+    cap = open_decoder("data/videos/test_near_miss.mp4", size=(640, 480), reuse_buffer=True,
+                       interpolation=cv2.INTER_LINEAR)
+
+    # Both off by default, so every frame goes through the full detector
     detector = ObjectDetector()
+    if os.getenv("AEGIS_MOTION_GATE", "0") == "1":
+        # Inference only where something moves, inside the calibrated road area
+        roi = load_roi(ROI_PATH) if os.path.exists(ROI_PATH) else None
+        detector = GatedDetector(detector, MotionGate(roi=roi))
+
+    scheduler = None
+    detect_interval = int(os.getenv("AEGIS_DETECT_INTERVAL", "1"))
+    if detect_interval > 1:
+        scheduler = DetectionScheduler(interval=detect_interval)
     tracker = CentroidTracker()
     motion_analyzer = RelativeMotionAnalyzer(None)
     risk_model = NearMissRiskModel()
     event_detector = NearMissEventDetector()
 
     logger = SignalLogger()
+    telemetry = TelemetryClient(TELEMETRY_URL).start()
 
     frame_number = 0
     fps = 30
@@ -29,63 +77,46 @@ def main():
     cv2.namedWindow("AEGIS", cv2.WINDOW_NORMAL)
 
     while True:
-        ret, frame = read_frame(cap)
+        with metrics.span("decode"):
+            ret, frame = read_frame(cap)
         if not ret:
             break
 
-        frame = cv2.resize(frame, (640, 480))
-
         frame_number += 1
         frame_count += 1
 
-        detections = detector.detect(frame)
-        tracked_objects = tracker.update(detections)
-
-        motion_data = motion_analyzer.analyze(tracked_objects, frame_number, fps)
-        risk_data = risk_model.compute_nmrs(motion_data)
-        event_data = event_detector.update(risk_data)
-
-        # SEND DATA (OPTIMIZED)
-        if frame_count % 10 == 0:
-
-            persons = [obj for obj in tracked_objects if obj["class"] == "person"]
-            vehicles = [obj for obj in tracked_objects if obj["class"] != "person"]
-
-            if persons and vehicles:
-                p = persons[0]
-                v = vehicles[0]
-
-                object_1 = f"person_{p['id']}"
-                object_2 = f"car_{v['id']}"
-
-            elif persons:
-                p = persons[0]
-                object_1 = f"person_{p['id']}"
-                object_2 = "no_vehicle"
-
-            elif vehicles:
-                v = vehicles[0]
-                object_1 = "no_person"
-                object_2 = f"car_{v['id']}"
-
+        with metrics.span("detect"):
+            if scheduler is not None:
+                # Full detection every few frames, more often around risky pairs
+                detections = scheduler.next(frame, detector)
             else:
-                object_1 = "none"
-                object_2 = "none"
-
-            data = {
-                "object_1": object_1,
-                "object_2": object_2,
-                "distance": round(random.uniform(1, 5), 2),
-                "ttc": round(random.uniform(0.5, 3), 2),
-                "nmrs": round(random.uniform(0.3, 0.9), 2),
-                "risk_level": random.choice(["LOW", "MEDIUM", "HIGH"]),
-                "ai_summary": "Real-time event detected"
-            }
-
-            try:
-                requests.post("http://127.0.0.1:8000/analyze", json=data, timeout=0.2)
-            except:
-                pass
+                detections = detector.detect(frame)
+
+        first_new_id = tracker.next_id
+        with metrics.span("track"):
+            tracked_objects = tracker.update(detections)
+
+        with metrics.span("motion"):
+            motion_data = motion_analyzer.analyze(tracked_objects, frame_number, fps)
+        with metrics.span("risk"):
+            risk_data = risk_model.compute_nmrs(motion_data)
+            event_data = event_detector.update(risk_data)
+
+        metrics.inc("frames")
+        metrics.inc("detections", len(detections))
+        metrics.inc("tracks", tracker.next_id - first_new_id)
+        metrics.inc("near_misses", sum(1 for e in event_data if e.get("near_miss")))
+
+        if scheduler is not None:
+            scheduler.update_risk(
+                max((r["nmrs"] for r in risk_data), default=None),
+                min((r["ttc"] for r in risk_data), default=None)
+            )
+
+        # SEND DATA (queued; posted in batches by the telemetry thread)
+        if frame_count % SEND_EVERY == 0:
+            for e in event_data:
+                telemetry.send(event_record(e, frame_number))
 
         # DRAW BOXES
         for obj in tracked_objects:
@@ -104,8 +135,12 @@ def main():
             break
 
     release_video(cap)
+    telemetry.close()
     cv2.destroyAllWindows()
 
+    log.info("Processed %d frames; telemetry sent %d, dropped %d, failed %d",
+             frame_count, telemetry.sent, telemetry.dropped, telemetry.failed)
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,81 @@
+# src/broadcaster.py
+
+import asyncio
+import json
+
+
+class Subscriber:
+    """One connected client: a bounded queue of already-encoded messages."""
+
+    def __init__(self, queue_size):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.lagged = False
+
+
+class Broadcaster:
+    """
+    Fan-out of Server-Sent Events to every connected subscriber.
+
+    Each published event is serialized once and the same bytes are put on
+    every subscriber's queue. A subscriber that falls queue_size messages
+    behind is dropped; its EventSource reconnects and starts again from a
+    fresh snapshot.
+
+    publish() must be called from the event loop.
+    """
+
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self.subscribers = set()
+
+    @staticmethod
+    def encode(event, data, event_id=None):
+        lines = []
+        if event_id is not None:
+            lines.append(f"id: {event_id}")
+        lines.append(f"event: {event}")
+        lines.append(f"data: {json.dumps(data)}")
+        return ("\n".join(lines) + "\n\n").encode()
+
+    def subscribe(self):
+        subscriber = Subscriber(self.queue_size)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, event, data, event_id=None):
+        if not self.subscribers:
+            return
+
+        message = self.encode(event, data, event_id)
+
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                subscriber.lagged = True
+                self.unsubscribe(subscriber)
+
+    async def stream(self, subscriber, first=b"", keepalive=15.0):
+        """
+        Bytes for a StreamingResponse: `first` (usually a snapshot), then
+        every published message, with a comment line as keep-alive.
+        """
+        try:
+            if first:
+                yield first
+
+            while not subscriber.lagged or not subscriber.queue.empty():
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    if subscriber.lagged:
+                        break
+                    yield b": keep-alive\n\n"
+                    continue
+
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
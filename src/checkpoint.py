@@ -0,0 +1,59 @@
+# src/checkpoint.py
+
+import json
+import logging
+import os
+import tempfile
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 2
+
+
+def save_checkpoint(path, state):
+    """
+    Write state to path as JSON. The file is written next to path and
+    renamed over it, so a crash mid-write leaves the previous checkpoint
+    in place rather than a truncated one.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".checkpoint-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(dict(state, version=CHECKPOINT_VERSION), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_checkpoint(path):
+    """
+    State saved by save_checkpoint, or None if path does not exist or
+    holds an unreadable or older-format checkpoint.
+    """
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable checkpoint %s: %s", path, e)
+        return None
+
+    if state.get("version") != CHECKPOINT_VERSION:
+        logger.warning("Ignoring checkpoint %s with version %s", path, state.get("version"))
+        return None
+
+    return state
+
+
+def remove_checkpoint(path):
+    if path and os.path.exists(path):
+        os.remove(path)
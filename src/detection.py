@@ -1,43 +1,94 @@
 # src/detection.py
 
-from ultralytics import YOLO
+import numpy as np
+
+from src.inference import load_backend
+
+
+# Label codes used by the vectorized filter
+LABEL_NONE = 0
+LABEL_PERSON = 1
+LABEL_VEHICLE = 2
+LABELS = {LABEL_PERSON: "person", LABEL_VEHICLE: "vehicle"}
 
 
 class ObjectDetector:
-    def __init__(self, model_path="yolov8n.pt", conf_threshold=0.4):
-        self.model = YOLO(model_path)
+    """
+    People and vehicles from a YOLOv8 model.
+
+    backend picks the runtime: "torch" (ultralytics), "onnx" (ONNX
+    Runtime, optionally with INT8 weights) or "openvino". Exported graphs
+    are built from model_path once and cached; threads sets the CPU
+    thread count. Output is the same for every backend.
+
+    Frames are letterboxed to imgsz, whatever their resolution. The
+    confidence threshold and the person/vehicle class ids go into
+    inference, so NMS never sees the other classes.
+    """
+
+    def __init__(self, model_path="yolov8n.pt", conf_threshold=0.4, backend="torch",
+                 threads=None, int8=False, imgsz=640):
+        self.backend = load_backend(backend, model_path, imgsz, threads=threads, int8=int8)
+        self.backend_name = backend
+        self.imgsz = imgsz
         self.conf_threshold = conf_threshold
 
         # YOLO class names
         self.person_class = "person"
         self.vehicle_classes = {"car", "bus", "truck", "motorcycle"}
 
-    def detect(self, frame):
-        detections = []
-
-        results = self.model(frame, verbose=False)[0]
-
-        for box in results.boxes:
-            cls_id = int(box.cls[0])
-            cls_name = results.names[cls_id]
-            confidence = float(box.conf[0])
+        # class id -> label code lookup, built once from the model names
+        self._label_codes = self._build_label_codes(self.backend.names)
+        self.class_ids = np.flatnonzero(self._label_codes != LABEL_NONE)
 
-            if confidence < self.conf_threshold:
-                continue
+    def _build_label_codes(self, names):
+        codes = np.full(max(names) + 1, LABEL_NONE, dtype=np.int8)
 
+        for cls_id, cls_name in names.items():
             if cls_name == self.person_class:
-                label = "person"
+                codes[cls_id] = LABEL_PERSON
             elif cls_name in self.vehicle_classes:
-                label = "vehicle"
-            else:
-                continue
+                codes[cls_id] = LABEL_VEHICLE
 
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
+        return codes
 
-            detections.append({
-                "class": label,
+    def _parse(self, xyxy, conf, cls_ids):
+        if len(cls_ids) == 0:
+            return []
+
+        codes = self._label_codes[cls_ids]
+
+        keep = (conf >= self.conf_threshold) & (codes != LABEL_NONE)
+
+        if not keep.any():
+            return []
+
+        xyxy = xyxy[keep].astype(np.int64).tolist()
+
+        return [
+            {
+                "class": LABELS[code],
                 "confidence": confidence,
-                "bbox": [x1, y1, x2, y2]
-            })
+                "bbox": bbox
+            }
+            for code, confidence, bbox in zip(
+                codes[keep].tolist(), conf[keep].tolist(), xyxy
+            )
+        ]
+
+    def detect(self, frame):
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        """
+        Run the model once over a list of frames.
+        Returns one detection list per frame, in input order.
+        """
+        if len(frames) == 0:
+            return []
+
+        results = self.backend.predict(
+            frames, conf=self.conf_threshold, classes=self.class_ids
+        )
 
-        return detections
+        return [self._parse(*r) for r in results]
@@ -0,0 +1,80 @@
+# src/incident_buffer.py
+
+from collections import deque
+from itertools import islice
+import threading
+
+
+class IncidentBuffer:
+    """
+    The most recent `capacity` alerts, with running counts per risk level.
+
+    Records must be dicts whose risk_level is one of `levels`; check()
+    raises ValueError for any other. Every record gets a sequence
+    number, so readers can ask for only what arrived after the last one
+    they saw. Appends and reads take a short
+    lock and are O(1), apart from copying out the records returned.
+    """
+
+    def __init__(self, capacity=50, levels=("LOW", "MEDIUM", "HIGH")):
+        if capacity < 1:
+            raise ValueError(f"Incident buffer capacity must be at least 1, not {capacity}")
+
+        self.capacity = capacity
+        self._records = deque(maxlen=capacity)
+        self._counts = dict.fromkeys(levels, 0)
+        self._next_seq = 1
+        self._lock = threading.Lock()
+
+    def check(self, record):
+        if not isinstance(record, dict):
+            raise ValueError("Alert must be a JSON object")
+
+        level = record.get("risk_level")
+        if level not in self._counts:
+            raise ValueError(
+                f"Unknown risk_level {level!r}; expected one of {', '.join(self._counts)}"
+            )
+
+    def append(self, record):
+        """Store a record; returns (seq, delta) with the per-level count change."""
+        self.check(record)
+        level = record["risk_level"]
+
+        with self._lock:
+            delta = {level: 1}
+
+            if len(self._records) == self.capacity:
+                evicted = self._records[0].get("risk_level")
+                delta[evicted] = delta.get(evicted, 0) - 1
+
+            # deque(maxlen) drops the oldest record itself
+            self._records.append(record)
+
+            for lvl, change in delta.items():
+                self._counts[lvl] += change
+
+            seq = self._next_seq
+            self._next_seq += 1
+
+        return seq, {lvl: change for lvl, change in delta.items() if change}
+
+    @property
+    def last_seq(self):
+        return self._next_seq - 1
+
+    def since(self, seq=0):
+        """Records newer than seq, oldest first, and the latest seq."""
+        with self._lock:
+            first_seq = self._next_seq - len(self._records)
+            skip = max(0, seq + 1 - first_seq)
+            return list(islice(self._records, skip, None)), self._next_seq - 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def snapshot(self):
+        """Records, counts and latest seq taken together under one lock."""
+        with self._lock:
+            return list(self._records), dict(self._counts), self._next_seq - 1
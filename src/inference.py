@@ -0,0 +1,478 @@
+# src/inference.py
+
+from abc import ABC, abstractmethod
+import json
+import os
+import shutil
+import tempfile
+
+import cv2
+from filelock import FileLock
+import numpy as np
+
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+# Same defaults as ultralytics predict, so every backend returns the same boxes
+NMS_CONF = 0.25
+NMS_IOU = 0.7
+MAX_DET = 300
+
+
+# -------------------------------
+# EXPORT CACHE
+# -------------------------------
+def _source_key(model_path):
+    if os.path.exists(model_path):
+        stat = os.stat(model_path)
+        return {"source": os.path.abspath(model_path), "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns}
+    # Resolved by ultralytics (e.g. downloaded weights); keyed by name only
+    return {"source": model_path}
+
+
+def _cached_names(target, key):
+    meta_path = target + ".json"
+    if not (os.path.exists(target) and os.path.exists(meta_path)):
+        return None
+
+    with open(meta_path) as f:
+        meta = json.load(f)
+
+    if meta.get("key") != key:
+        return None
+    return {int(k): v for k, v in meta["names"].items()}
+
+
+def _write_meta(target, key, names):
+    tmp = target + ".json.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"key": key, "names": names}, f, indent=2)
+    os.replace(tmp, target + ".json")
+
+
+def _replace(path, target):
+    # os.replace cannot overwrite a non-empty directory (OpenVINO exports),
+    # so an old one is renamed aside first and removed afterwards
+    old = None
+    if os.path.isdir(target):
+        old = tempfile.mkdtemp(dir=os.path.dirname(target), prefix=".old-")
+        os.replace(target, os.path.join(old, "model"))
+
+    os.replace(path, target)
+
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def _export(model_path, fmt, imgsz, workdir):
+    from ultralytics import YOLO
+
+    # ultralytics writes the export next to the weights; a private copy
+    # keeps concurrent exports of the same weights apart
+    if os.path.exists(model_path):
+        copy = os.path.join(workdir, os.path.basename(model_path))
+        shutil.copyfile(model_path, copy)
+        model_path = copy
+
+    model = YOLO(model_path)
+    exported = model.export(format=fmt, imgsz=imgsz, dynamic=True, verbose=False)
+    return str(exported), dict(model.names)
+
+
+def export_model(model_path, fmt, imgsz=640, int8=False, cache_dir=None):
+    """
+    Exported copy of `model_path` for an optimized runtime, built once and
+    cached under cache_dir (AEGIS_MODEL_CACHE, default "models").
+
+    fmt is "onnx" or "openvino". int8 applies ONNX Runtime dynamic
+    quantization to the ONNX export. Returns (path, class names). The
+    cache is rebuilt when the source weights change.
+
+    Safe to call from several processes at once: a file lock next to the
+    cached copy lets one of them export while the others wait, and the
+    copy is built under a temporary name and renamed into place.
+    """
+    if fmt not in ("onnx", "openvino"):
+        raise ValueError(f"Unknown export format: {fmt}")
+    if int8 and fmt != "onnx":
+        raise ValueError("INT8 weights are only supported with the onnx backend")
+
+    cache_dir = cache_dir or os.getenv("AEGIS_MODEL_CACHE", "models")
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    suffix = ".onnx" if fmt == "onnx" else "_openvino_model"
+    target = os.path.join(cache_dir, f"{stem}-{imgsz}{'-int8' if int8 else ''}{suffix}")
+    key = dict(_source_key(model_path), imgsz=imgsz, int8=int8)
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    with FileLock(target + ".lock"):
+        names = _cached_names(target, key)
+        if names is not None:
+            return target, names
+
+        workdir = tempfile.mkdtemp(dir=cache_dir, prefix=".export-")
+        try:
+            if int8:
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+
+                # A different target, so a different lock
+                fp32_path, names = export_model(model_path, "onnx", imgsz, cache_dir=cache_dir)
+                built = os.path.join(workdir, os.path.basename(target))
+                quantize_dynamic(fp32_path, built, weight_type=QuantType.QUInt8)
+            else:
+                built, names = _export(model_path, fmt, imgsz, workdir)
+
+            _replace(built, target)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        _write_meta(target, key, names)
+        return target, names
+
+
+# -------------------------------
+# PRE / POST PROCESSING
+# -------------------------------
+def letterbox_geometry(shape, imgsz=640, stride=32):
+    """
+    How a frame of `shape` fits into imgsz keeping its aspect ratio,
+    padded to a multiple of stride as ultralytics does for rectangular
+    inference. Returns ((new_w, new_h), gain, (left, top), (out_h, out_w)).
+    """
+    h, w = shape[:2]
+    gain = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * gain)), int(round(h * gain))
+
+    dw = ((imgsz - new_w) % stride) / 2
+    dh = ((imgsz - new_h) % stride) / 2
+
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+
+    return (new_w, new_h), gain, (left, top), (new_h + top + bottom, new_w + left + right)
+
+
+class Letterbox:
+    """
+    Letterboxes same-shaped frames straight into an NCHW float32 batch.
+
+    The geometry is worked out once per frame shape, and the padded
+    canvas and input tensor are allocated once per (shape, batch size).
+    The border is filled a single time, since only the image area is
+    overwritten. The returned tensor is reused by the next call.
+    """
+
+    def __init__(self, imgsz=640, stride=32):
+        self.imgsz = imgsz
+        self.stride = stride
+        self._geometry = {}
+        self._buffers = {}
+
+    def geometry(self, shape):
+        if shape not in self._geometry:
+            self._geometry[shape] = letterbox_geometry(shape, self.imgsz, self.stride)
+        return self._geometry[shape]
+
+    def __call__(self, frames):
+        """(tensor, gain, pad) for frames that all have one shape."""
+        shape = frames[0].shape
+        (new_w, new_h), gain, (left, top), (out_h, out_w) = self.geometry(shape)
+
+        key = (shape, len(frames))
+        if key not in self._buffers:
+            self._buffers[key] = (
+                np.full((len(frames), out_h, out_w, 3), 114, dtype=np.uint8),
+                np.empty((len(frames), 3, out_h, out_w), dtype=np.float32)
+            )
+        canvas, tensor = self._buffers[key]
+
+        resize = (new_w, new_h) != (shape[1], shape[0])
+        for i, frame in enumerate(frames):
+            canvas[i, top:top + new_h, left:left + new_w] = (
+                cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+                if resize else frame
+            )
+
+        # BGR HWC uint8 to RGB CHW in [0, 1]
+        np.multiply(canvas[..., ::-1].transpose(0, 3, 1, 2), 1 / 255.0, out=tensor)
+        return tensor, gain, (left, top)
+
+
+def postprocess(output, gain, pad, shape, conf=NMS_CONF, iou=NMS_IOU, max_det=MAX_DET,
+                classes=None):
+    """
+    One image's raw YOLOv8 head output, (4 + classes, anchors), to
+    (xyxy, confidence, class id) arrays in source-frame pixels.
+
+    classes limits the boxes to those class ids before NMS. As in
+    ultralytics, a box keeps its best class over all classes and is
+    dropped when that class is not wanted.
+    """
+    scores = output[4:]
+
+    # Only anchors that clear conf get the full argmax; with a class list
+    # this first pass reads just those classes' rows
+    if classes is not None:
+        candidates = np.flatnonzero(scores[classes].max(axis=0) > conf)
+    else:
+        candidates = np.flatnonzero(scores.max(axis=0) > conf)
+
+    candidate_scores = scores[:, candidates]
+    cls_ids = candidate_scores.argmax(axis=0)
+    confidence = candidate_scores[cls_ids, np.arange(len(candidates))]
+
+    keep = confidence > conf
+    if classes is not None:
+        keep &= np.isin(cls_ids, classes)
+
+    preds = output[:4, candidates[keep]].T
+    cls_ids, confidence = cls_ids[keep], confidence[keep]
+
+    if len(preds) == 0:
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64)
+
+    cx, cy, bw, bh = preds[:, 0], preds[:, 1], preds[:, 2], preds[:, 3]
+    xywh = np.stack([cx - bw / 2, cy - bh / 2, bw, bh], axis=1)
+
+    # Per-class NMS, like ultralytics' class-offset trick
+    kept = cv2.dnn.NMSBoxesBatched(
+        xywh.tolist(), confidence.tolist(), cls_ids.tolist(), conf, iou
+    )
+    kept = np.asarray(kept, dtype=np.int64).reshape(-1)
+    kept = kept[np.argsort(-confidence[kept], kind="stable")][:max_det]
+
+    xyxy = xywh[kept].copy()
+    xyxy[:, 2:] += xyxy[:, :2]
+    xyxy[:, [0, 2]] -= pad[0]
+    xyxy[:, [1, 3]] -= pad[1]
+    xyxy /= gain
+
+    h, w = shape[:2]
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w)
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h)
+
+    return xyxy, confidence[kept], cls_ids[kept].astype(np.int64)
+
+
+# -------------------------------
+# BACKENDS
+# -------------------------------
+class TorchBackend:
+    """PyTorch weights through ultralytics."""
+
+    def __init__(self, model_path, imgsz=640, threads=None):
+        from ultralytics import YOLO
+
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+
+        self.model = YOLO(model_path)
+        self.names = dict(self.model.names)
+        self.imgsz = imgsz
+
+    def predict(self, frames, conf=NMS_CONF, iou=NMS_IOU, classes=None):
+        results = self.model(
+            list(frames), imgsz=self.imgsz, conf=conf, iou=iou,
+            classes=None if classes is None else [int(c) for c in classes],
+            verbose=False
+        )
+
+        return [
+            (
+                r.boxes.xyxy.cpu().numpy(),
+                r.boxes.conf.cpu().numpy(),
+                r.boxes.cls.cpu().numpy().astype(np.int64)
+            )
+            for r in results
+        ]
+
+
+class _ExportedBackend(ABC):
+    """Shared letterbox / batch / NMS path for exported graphs."""
+
+    def __init__(self, imgsz=640):
+        self.imgsz = imgsz
+        self.letterbox = Letterbox(imgsz)
+
+    @abstractmethod
+    def _run(self, batch):
+        """Raw network output for an NCHW float32 batch."""
+
+    def predict(self, frames, conf=NMS_CONF, iou=NMS_IOU, classes=None):
+        if len(frames) == 0:
+            return []
+
+        if classes is not None:
+            classes = np.asarray(classes, dtype=np.int64)
+
+        # Frames of one shape share a letterbox shape and run as one batch
+        groups = {}
+        for i, frame in enumerate(frames):
+            groups.setdefault(frame.shape, []).append(i)
+
+        out = [None] * len(frames)
+        for shape, idx in groups.items():
+            batch, gain, pad = self.letterbox([frames[i] for i in idx])
+            raw = self._run(batch)
+
+            for j, i in enumerate(idx):
+                out[i] = postprocess(raw[j], gain, pad, shape, conf, iou, classes=classes)
+
+        return out
+
+
+class OnnxBackend(_ExportedBackend):
+    """ONNX Runtime on CPU, FP32 or dynamically quantized INT8."""
+
+    def __init__(self, model_path, imgsz=640, threads=None, int8=False):
+        import onnxruntime as ort
+
+        super().__init__(imgsz)
+        path, self.names = export_model(model_path, "onnx", imgsz, int8=int8)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+
+        self.session = ort.InferenceSession(
+            path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVINOBackend(_ExportedBackend):
+    """OpenVINO runtime on CPU."""
+
+    def __init__(self, model_path, imgsz=640, threads=None):
+        import openvino as ov
+
+        super().__init__(imgsz)
+        path, self.names = export_model(model_path, "openvino", imgsz)
+
+        xml = next(f for f in os.listdir(path) if f.endswith(".xml"))
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+
+        core = ov.Core()
+        self.model = core.compile_model(os.path.join(path, xml), "CPU", config)
+
+    def _run(self, batch):
+        return self.model(batch)[0]
+
+
+def load_backend(name, model_path, imgsz=640, threads=None, int8=False):
+    if name == "torch":
+        if int8:
+            raise ValueError("INT8 weights are only supported with the onnx backend")
+        return TorchBackend(model_path, imgsz, threads)
+    if name == "onnx":
+        return OnnxBackend(model_path, imgsz, threads, int8)
+    if name == "openvino":
+        if int8:
+            raise ValueError("INT8 weights are only supported with the onnx backend")
+        return OpenVINOBackend(model_path, imgsz, threads)
+    raise ValueError(f"Unknown inference backend: {name}")
+
+
+# -------------------------------
+# PARITY CHECK
+# -------------------------------
+def _iou(a, b):
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match_detections(reference, candidate, iou_threshold=0.9):
+    """
+    Compare two lists of per-frame detections. A reference box counts as
+    matched when the candidate has a same-class box with IoU at least
+    iou_threshold. Returns counts and the worst per-frame match rate.
+    """
+    matched = total = extra = 0
+    worst = 1.0
+
+    for ref, cand in zip(reference, candidate):
+        frame_matched = 0
+        used = set()
+
+        if ref and cand:
+            ious = _iou(
+                np.array([d["bbox"] for d in ref], dtype=np.float64),
+                np.array([d["bbox"] for d in cand], dtype=np.float64)
+            )
+            for i, r in enumerate(ref):
+                for j in np.argsort(-ious[i]):
+                    if ious[i, j] < iou_threshold:
+                        break
+                    if j not in used and cand[j]["class"] == r["class"]:
+                        used.add(j)
+                        frame_matched += 1
+                        break
+
+        matched += frame_matched
+        total += len(ref)
+        extra += len(cand) - len(used)
+        if ref:
+            worst = min(worst, frame_matched / len(ref))
+
+    return {
+        "reference_boxes": total,
+        "matched": matched,
+        "unmatched_candidate_boxes": extra,
+        "match_rate": matched / total if total else 1.0,
+        "worst_frame_match_rate": worst,
+    }
+
+
+def parity_check(reference, candidate, frames, iou_threshold=0.9):
+    """match_detections() for two detectors run over the same frames."""
+    return match_detections(
+        reference.detect_batch(frames), candidate.detect_batch(frames), iou_threshold
+    )
+
+
+def main():
+    import argparse
+
+    from src.detection import ObjectDetector
+    from src.video_io import sample_frames
+
+    parser = argparse.ArgumentParser(
+        description="Compare an exported backend's detections with the PyTorch path."
+    )
+    parser.add_argument("video", help="Video to sample frames from")
+    parser.add_argument("--model", default="yolov8n.pt", help="PyTorch weights")
+    parser.add_argument("--backend", default="onnx", choices=BACKENDS[1:])
+    parser.add_argument("--int8", action="store_true", help="Quantized ONNX weights")
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--frames", type=int, default=32, help="Frames to sample")
+    parser.add_argument("--iou", type=float, default=0.9, help="Match IoU threshold")
+    args = parser.parse_args()
+
+    frames = sample_frames(args.video, args.frames)
+
+    reference = ObjectDetector(args.model)
+    candidate = ObjectDetector(args.model, backend=args.backend, threads=args.threads,
+                               int8=args.int8)
+
+    report = parity_check(reference, candidate, frames, args.iou)
+    print(json.dumps(dict(report, frames=len(frames), backend=args.backend,
+                          int8=args.int8), indent=2))
+
+
+if __name__ == "__main__":
+    main()
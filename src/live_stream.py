@@ -0,0 +1,192 @@
+# src/live_stream.py
+
+import logging
+import threading
+import time
+
+import cv2
+
+from src.video_io import open_video, read_frame, release_video
+from src.metrics import metrics
+from src.model_registry import registry
+from src.tracking import CentroidTracker
+
+
+logger = logging.getLogger(__name__)
+
+
+class LatestFrame:
+    """
+    The newest annotated frame of a stream, with its JPEG encodes cached
+    per quality so each (frame, quality) pair is encoded at most once.
+    Readers only ever see the latest frame; older ones are overwritten.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+        self._jpegs = {}
+        self.seq = 0
+
+    def publish(self, frame):
+        with self._lock:
+            self._frame = frame
+            self._jpegs = {}
+            self.seq += 1
+
+    def jpeg(self, quality):
+        """(seq, JPEG bytes) of the latest frame, or (0, None) before the first."""
+        with self._lock:
+            seq, frame, jpegs = self.seq, self._frame, self._jpegs
+            if frame is None:
+                return 0, None
+            if quality in jpegs:
+                return seq, jpegs[quality]
+
+        # Encode outside the lock; a concurrent duplicate encode is harmless
+        with metrics.span("stream_encode"):
+            ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        data = buffer.tobytes()
+        jpegs[quality] = data
+
+        return seq, data
+
+
+class StreamProducer:
+    """
+    One capture, detection and tracking loop per video source, feeding a
+    LatestFrame that any number of viewers read.
+
+    File sources are paced to their own frame rate. The loop stops when
+    the source ends or nobody has watched for idle_timeout seconds.
+    """
+
+    def __init__(self, source, size=(640, 480), idle_timeout=5.0):
+        self.source = source
+        self.size = size
+        self.idle_timeout = idle_timeout
+
+        self.latest = LatestFrame()
+        self.tracker = CentroidTracker()
+        self.finished = False
+
+        self._lock = threading.Lock()
+        self._viewers = 0
+        self._last_viewer = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._run, name=f"aegis-stream-{source}", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def add_viewer(self):
+        """
+        Count a viewer; False if the loop already decided to stop, in
+        which case the caller needs a new producer.
+        """
+        with self._lock:
+            if self.finished:
+                return False
+            self._viewers += 1
+            self._last_viewer = time.monotonic()
+            return True
+
+    def remove_viewer(self):
+        with self._lock:
+            self._viewers -= 1
+            self._last_viewer = time.monotonic()
+
+    def _stop_if_idle(self):
+        # Decided under the same lock as add_viewer, so a viewer is either
+        # counted before this check or sees finished and starts a new loop
+        with self._lock:
+            if (self._viewers == 0
+                    and time.monotonic() - self._last_viewer > self.idle_timeout):
+                self.finished = True
+            return self.finished
+
+    def _finish(self):
+        with self._lock:
+            self.finished = True
+
+    def _draw(self, frame, tracked_objects):
+        for obj in tracked_objects:
+            x1, y1, x2, y2 = obj["bbox"]
+            label = f"{obj['class']} #{obj['id']}"
+
+            color = (0, 255, 0) if obj["class"] == "person" else (0, 0, 255)
+
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, label, (x1, y1 - 5),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+    def _run(self):
+        try:
+            cap = open_video(self.source)
+        except RuntimeError:
+            logger.warning("Could not open stream source %s", self.source)
+            self._finish()
+            return
+
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        paced = cap.get(cv2.CAP_PROP_FRAME_COUNT) > 0
+        next_frame = time.monotonic()
+
+        try:
+            while not self._stop_if_idle():
+                with metrics.span("stream_decode"):
+                    success, frame = read_frame(cap)
+                if not success:
+                    break
+
+                frame = cv2.resize(frame, self.size)
+
+                with metrics.span("stream_detect"), registry.detector() as detector:
+                    detections = detector.detect(frame)
+                with metrics.span("stream_track"):
+                    tracked_objects = self.tracker.update(detections)
+
+                metrics.inc("stream_frames")
+                metrics.inc("stream_detections", len(detections))
+
+                self._draw(frame, tracked_objects)
+                self.latest.publish(frame)
+
+                if paced:
+                    next_frame += 1 / fps
+                    delay = next_frame - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        # Running behind; do not try to catch up in a burst
+                        next_frame = time.monotonic()
+        finally:
+            release_video(cap)
+            self._finish()
+
+
+class LiveStreams:
+    """
+    Running producers by source; a new one starts for the first viewer.
+    join() counts the caller as a viewer, who must call remove_viewer()
+    on the returned producer when done.
+    """
+
+    def __init__(self, idle_timeout=5.0):
+        self.idle_timeout = idle_timeout
+        self._producers = {}
+        self._lock = threading.Lock()
+
+    def join(self, source):
+        with self._lock:
+            producer = self._producers.get(source)
+
+            if producer is None or not producer.add_viewer():
+                producer = StreamProducer(source, idle_timeout=self.idle_timeout)
+                self._producers[source] = producer
+                producer.add_viewer()
+                producer.start()
+
+            return producer
@@ -0,0 +1,202 @@
+# src/metrics.py
+
+from bisect import bisect_left
+import cProfile
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the stage duration histogram buckets
+SPAN_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """
+    Process-wide stage timings and counters in the Prometheus text format.
+
+    - span(stage) times a block into the <prefix>_stage_seconds histogram.
+    - inc(name, n) adds to the <prefix>_<name>_total counter.
+    - gauge(name, fn) reports fn() as <prefix>_<name> at render time.
+
+    When disabled (AEGIS_METRICS=0), inc() returns at once and span()
+    hands back a shared no-op context manager, so instrumented code costs
+    one attribute check per call.
+    """
+
+    def __init__(self, enabled=None, prefix="aegis", buckets=SPAN_BUCKETS):
+        if enabled is None:
+            enabled = os.getenv("AEGIS_METRICS", "1") == "1"
+
+        self.enabled = enabled
+        self.prefix = prefix
+        self.buckets = buckets
+
+        self._lock = threading.Lock()
+        self._counters = {}
+        # stage -> per-bucket counts (last slot is +Inf), then the sum
+        self._spans = {}
+        self._gauges = {}
+
+    def span(self, stage):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage)
+
+    def observe(self, stage, seconds):
+        bucket = bisect_left(self.buckets, seconds)
+
+        with self._lock:
+            hist = self._spans.get(stage)
+            if hist is None:
+                hist = self._spans[stage] = [0] * (len(self.buckets) + 1) + [0.0]
+            hist[bucket] += 1
+            hist[-1] += seconds
+
+    def inc(self, name, value=1):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name, fn):
+        self._gauges[name] = fn
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._spans = {}
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            spans = {stage: list(hist) for stage, hist in self._spans.items()}
+
+        lines = []
+
+        for name in sorted(counters):
+            metric = f"{self.prefix}_{name}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {counters[name]}"]
+
+        for name in sorted(self._gauges):
+            try:
+                value = self._gauges[name]()
+            except Exception:
+                logger.exception("Gauge %s failed", name)
+                continue
+
+            metric = f"{self.prefix}_{name}"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+
+        if spans:
+            metric = f"{self.prefix}_stage_seconds"
+            lines += [
+                f"# HELP {metric} Duration of each pipeline stage call.",
+                f"# TYPE {metric} histogram",
+            ]
+
+            for stage in sorted(spans):
+                hist = spans[stage]
+                label = f'stage="{stage}"'
+                count = 0
+
+                for bound, n in zip(self.buckets, hist):
+                    count += n
+                    lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {count}')
+
+                count += hist[len(self.buckets)]
+                lines += [
+                    f'{metric}_bucket{{{label},le="+Inf"}} {count}',
+                    f"{metric}_sum{{{label}}} {hist[-1]:.6f}",
+                    f"{metric}_count{{{label}}} {count}",
+                ]
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="0.0.0.0"):
+        """
+        Serve render() at /metrics from a daemon thread, for processes
+        without a web app of their own (main.py).
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(
+            target=server.serve_forever, name="aegis-metrics", daemon=True
+        ).start()
+        return server
+
+
+@contextmanager
+def profiled(path):
+    """
+    cProfile the block and dump the stats to path (read them with pstats
+    or snakeviz). Does nothing when path is None. Only the calling thread
+    is profiled.
+    """
+    if path is None:
+        yield None
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        profiler.dump_stats(path)
+
+
+metrics = Metrics()
@@ -0,0 +1,144 @@
+# src/model_registry.py
+
+from contextlib import contextmanager
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from src.detection import ObjectDetector
+
+
+class DetectorPool:
+    """
+    Up to `size` loaded detectors for one set of weights.
+
+    Instances are created on first demand and handed out one caller at a
+    time, since a YOLO model must not run two predictions at once.
+    """
+
+    def __init__(self, model_path, conf_threshold, size, warmup_shape, backend_options=None):
+        self.model_path = model_path
+        self.conf_threshold = conf_threshold
+        self.size = size
+        self.warmup_shape = warmup_shape
+        self.backend_options = backend_options or {}
+
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+        self.load_seconds = []
+        self.warmup_seconds = []
+
+    def _create(self):
+        start = time.perf_counter()
+        detector = ObjectDetector(
+            self.model_path, conf_threshold=self.conf_threshold, **self.backend_options
+        )
+        loaded = time.perf_counter()
+
+        # First inference builds the graph and allocates buffers
+        detector.detect(np.zeros(self.warmup_shape, dtype=np.uint8))
+        warmed = time.perf_counter()
+
+        self.load_seconds.append(loaded - start)
+        self.warmup_seconds.append(warmed - loaded)
+        return detector
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+
+        if create:
+            try:
+                return self._create()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        return self._idle.get()
+
+    def release(self, detector):
+        self._idle.put(detector)
+
+    def warm_up(self):
+        """Load every instance now instead of on first request."""
+        detectors = [self.acquire() for _ in range(self.size)]
+        for detector in detectors:
+            self.release(detector)
+
+    def stats(self):
+        return {
+            "model_path": self.model_path,
+            **self.backend_options,
+            "instances": self._created,
+            "size": self.size,
+            "load_seconds": [round(s, 4) for s in self.load_seconds],
+            "warmup_seconds": [round(s, 4) for s in self.warmup_seconds],
+        }
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of detector pools, keyed by weights and threshold.
+    Every pool uses the same inference backend and size, from
+    AEGIS_BACKEND, AEGIS_INFER_THREADS, AEGIS_INT8 and AEGIS_IMGSZ unless
+    given.
+    """
+
+    def __init__(self, size=None, warmup_shape=(640, 640, 3), backend=None, threads=None,
+                 int8=None, imgsz=None):
+        self.size = size or int(os.getenv("AEGIS_DETECTORS", "1"))
+        self.warmup_shape = warmup_shape
+
+        threads = threads or int(os.getenv("AEGIS_INFER_THREADS", "0")) or None
+        self.backend_options = {
+            "backend": backend or os.getenv("AEGIS_BACKEND", "torch"),
+            "threads": threads,
+            "int8": int8 if int8 is not None else os.getenv("AEGIS_INT8", "0") == "1",
+            "imgsz": imgsz or int(os.getenv("AEGIS_IMGSZ", "640")),
+        }
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def pool(self, model_path="yolov8n.pt", conf_threshold=0.4):
+        key = (model_path, conf_threshold)
+
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = DetectorPool(
+                    model_path, conf_threshold, self.size, self.warmup_shape,
+                    self.backend_options
+                )
+            return self._pools[key]
+
+    @contextmanager
+    def detector(self, model_path="yolov8n.pt", conf_threshold=0.4):
+        pool = self.pool(model_path, conf_threshold)
+        detector = pool.acquire()
+        try:
+            yield detector
+        finally:
+            pool.release(detector)
+
+    def warm_up(self, model_path="yolov8n.pt", conf_threshold=0.4):
+        self.pool(model_path, conf_threshold).warm_up()
+
+    def stats(self):
+        with self._lock:
+            pools = list(self._pools.values())
+        return [p.stats() for p in pools]
+
+
+registry = ModelRegistry()
@@ -3,13 +3,83 @@
 import math
 import numpy as np
 
+from src.track_store import TrackStore, PERSON, VEHICLE, pair_keys
+
+
+class PairStateTable:
+    """
+    Per-pair EMA state for the all-pairs mode, as arrays sorted by key.
+
+    Keys come from pair_keys(). Track ids are never reused, so the table
+    only has to hold the pairs seen in the latest frame.
+    """
+
+    COLUMNS = ("keys", "distance", "time", "velocity", "ttc")
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.int64)
+        self.distance = np.empty(0)
+        self.time = np.empty(0)
+        self.velocity = np.empty(0)
+        self.ttc = np.empty(0)
+
+    def lookup(self, keys):
+        """Return (rows, found) for the given keys."""
+        rows = np.searchsorted(self.keys, keys)
+        rows = np.minimum(rows, max(len(self.keys) - 1, 0))
+        found = (self.keys[rows] == keys) if len(self.keys) else np.zeros(len(keys), bool)
+        return rows, found
+
+    def state_dict(self):
+        return {name: getattr(self, name).tolist() for name in self.COLUMNS}
+
+    def load_state_dict(self, state):
+        self.keys = np.array(state["keys"], dtype=np.int64)
+        for name in self.COLUMNS[1:]:
+            setattr(self, name, np.array(state[name], dtype=np.float64))
+
+    def replace(self, keys, distance, time, velocity, ttc):
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.distance = distance[order]
+        self.time = time[order]
+        self.velocity = velocity[order]
+        self.ttc = ttc[order]
+
 
 class RelativeMotionAnalyzer:
-    def __init__(self, homography_matrix):
+    def __init__(self, homography_matrix, mode="active_pair"):
         self.pair_states = {}
         self.H = homography_matrix
         self.active_pair = None
 
+        # "active_pair": follow the closest person/vehicle pair
+        # "all_pairs": score every person x vehicle pair each frame
+        if mode not in ("active_pair", "all_pairs"):
+            raise ValueError(f"Unknown motion mode: {mode}")
+        self.mode = mode
+        self.pair_table = PairStateTable()
+
+    def state_dict(self):
+        """Per-pair EMA state and the followed pair as plain JSON-able values."""
+        return {
+            "mode": self.mode,
+            "active_pair": [int(i) for i in self.active_pair] if self.active_pair else None,
+            "pair_states": [
+                [int(p_id), int(v_id), {name: float(value) for name, value in s.items()}]
+                for (p_id, v_id), s in self.pair_states.items()
+            ],
+            "pair_table": self.pair_table.state_dict()
+        }
+
+    def load_state_dict(self, state):
+        if state["mode"] != self.mode:
+            raise ValueError(f"State is for motion mode {state['mode']}, not {self.mode}")
+
+        self.active_pair = tuple(state["active_pair"]) if state["active_pair"] else None
+        self.pair_states = {(p_id, v_id): s for p_id, v_id, s in state["pair_states"]}
+        self.pair_table.load_state_dict(state["pair_table"])
+
     def _project_to_ground(self, p):
     # If no homography matrix, return original point
         if self.H is None:
@@ -22,10 +92,24 @@ class RelativeMotionAnalyzer:
         p_transformed /= p_transformed[2]
         return p_transformed[:2]
 
+    def _project_many(self, points):
+        """Project an (N, 2) array of image points in one matrix multiply."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+        if self.H is None:
+            return points
+
+        ones = np.ones((len(points), 1))
+        projected = np.hstack([points, ones]) @ self.H.T
+        return projected[:, :2] / projected[:, 2:3]
+
     def _distance(self, c1, c2):
         return math.sqrt((c1[0] - c2[0])**2 + (c1[1] - c2[1])**2)
 
     def analyze(self, tracked_objects, frame_number, fps):
+        if self.mode == "all_pairs":
+            return self._to_records(self.analyze_all_pairs(tracked_objects, frame_number, fps))
+
         persons = [o for o in tracked_objects if o["class"] == "person"]
         vehicles = [o for o in tracked_objects if o["class"] == "vehicle"]
 
@@ -43,7 +127,7 @@ class RelativeMotionAnalyzer:
             if p and v:
                 p_g = self._project_to_ground(p["centroid"])
                 v_g = self._project_to_ground(v["centroid"])
-                if p_g and v_g:
+                if p_g is not None and v_g is not None:
                     best_pair = (p, v, p_g, v_g)
 
         # find closest
@@ -68,8 +152,62 @@ class RelativeMotionAnalyzer:
             self.active_pair = (best_pair[0]["id"], best_pair[1]["id"])
 
         p, v, p_g, v_g = best_pair
+        return [self._pair_motion(p["id"], v["id"], p_g, v_g, frame_number, fps)]
+
+    def analyze_store(self, store, frame_number, fps):
+        """
+        Same as analyze(), reading the tracks straight from a TrackStore.
+        Each centroid is projected once and the closest pair is found on
+        a distance matrix instead of the nested loop.
+        """
+        if self.mode == "all_pairs":
+            return self._to_records(self.analyze_all_pairs(store, frame_number, fps))
+
+        n = store.size
+        classes = store.classes[:n]
+        ids = store.ids[:n]
+
+        p_rows = np.flatnonzero(classes == PERSON)
+        v_rows = np.flatnonzero(classes == VEHICLE)
+
+        if len(p_rows) == 0 or len(v_rows) == 0:
+            return []
+
+        best_pair = None
+
+        # keep same pair
+        if self.active_pair:
+            p_id, v_id = self.active_pair
+            p_match = p_rows[ids[p_rows] == p_id]
+            v_match = v_rows[ids[v_rows] == v_id]
+
+            if len(p_match) and len(v_match):
+                p_g = self._project_to_ground(store.centroids[p_match[0]])
+                v_g = self._project_to_ground(store.centroids[v_match[0]])
+                best_pair = (p_id, v_id, p_g, v_g)
+
+        # find closest
+        if best_pair is None:
+            p_ground = [self._project_to_ground(c) for c in store.centroids[p_rows]]
+            v_ground = [self._project_to_ground(c) for c in store.centroids[v_rows]]
+
+            P = np.array(p_ground)
+            V = np.array(v_ground)
+            dist = np.sqrt(
+                (P[:, None, 0] - V[None, :, 0])**2 + (P[:, None, 1] - V[None, :, 1])**2
+            )
+
+            i, j = np.unravel_index(np.argmin(dist), dist.shape)
+            best_pair = (int(ids[p_rows[i]]), int(ids[v_rows[j]]), p_ground[i], v_ground[j])
+
+            self.active_pair = (best_pair[0], best_pair[1])
+
+        p_id, v_id, p_g, v_g = best_pair
+        return [self._pair_motion(p_id, v_id, p_g, v_g, frame_number, fps)]
+
+    def _pair_motion(self, p_id, v_id, p_g, v_g, frame_number, fps):
         distance = self._distance(p_g, v_g)
-        key = (p["id"], v["id"])
+        key = (p_id, v_id)
 
         t = frame_number / fps
 
@@ -95,10 +233,100 @@ class RelativeMotionAnalyzer:
             "velocity": velocity
         }
 
-        return [{
-            "person_id": p["id"],
-            "vehicle_id": v["id"],
+        return {
+            "person_id": p_id,
+            "vehicle_id": v_id,
+            "distance": distance,
+            "relative_velocity": velocity,
+            "ttc": ttc
+        }
+
+    def _track_columns(self, tracks):
+        if isinstance(tracks, TrackStore):
+            n = tracks.size
+            return tracks.ids[:n], tracks.classes[:n], tracks.centroids[:n]
+
+        tracks = list(tracks)
+        ids = np.array([o["id"] for o in tracks], dtype=np.int64)
+        classes = np.array(
+            [PERSON if o["class"] == "person" else VEHICLE for o in tracks], dtype=np.int8
+        )
+        centroids = np.array([o["centroid"] for o in tracks], dtype=np.float64).reshape(-1, 2)
+        return ids, classes, centroids
+
+    def analyze_all_pairs(self, tracks, frame_number, fps):
+        """
+        Score every person x vehicle pair at once.
+
+        tracks is a TrackStore or a list of tracker dicts. Returns a dict of
+        flat arrays (person_id, vehicle_id, distance, relative_velocity,
+        ttc), one entry per pair, person-major; None if no pair exists.
+        """
+        ids, classes, centroids = self._track_columns(tracks)
+
+        is_person = classes == PERSON
+        is_vehicle = classes == VEHICLE
+
+        if not is_person.any() or not is_vehicle.any():
+            return None
+
+        ground = self._project_many(centroids)
+        p_ground = ground[is_person]
+        v_ground = ground[is_vehicle]
+
+        diff = p_ground[:, None, :] - v_ground[None, :, :]
+        distance = np.hypot(diff[..., 0], diff[..., 1]).ravel()
+
+        person_ids = np.repeat(ids[is_person], len(v_ground))
+        vehicle_ids = np.tile(ids[is_vehicle], len(p_ground))
+
+        t = frame_number / fps
+        table = self.pair_table
+        keys = pair_keys(person_ids, vehicle_ids)
+        rows, found = table.lookup(keys)
+
+        velocity = np.zeros(len(keys))
+        if found.any():
+            prev_rows = rows[found]
+            prev_v = table.velocity[prev_rows]
+            dt = t - table.time[prev_rows]
+
+            moving = dt > 0.001
+            raw_v = np.zeros_like(prev_v)
+            raw_v[moving] = (table.distance[prev_rows][moving] - distance[found][moving]) / dt[moving]
+            velocity[found] = np.where(moving, 0.7 * prev_v + 0.3 * raw_v, prev_v)
+
+        ttc = np.full(len(keys), np.inf)
+        approaching = velocity > 0
+        ttc[approaching] = distance[approaching] / velocity[approaching]
+
+        table.replace(keys, distance, np.full(len(keys), t), velocity, ttc)
+
+        return {
+            "person_id": person_ids,
+            "vehicle_id": vehicle_ids,
             "distance": distance,
             "relative_velocity": velocity,
             "ttc": ttc
-        }]
\ No newline at end of file
+        }
+
+    def _to_records(self, columns):
+        if columns is None:
+            return []
+
+        return [
+            {
+                "person_id": p_id,
+                "vehicle_id": v_id,
+                "distance": d,
+                "relative_velocity": v,
+                "ttc": ttc
+            }
+            for p_id, v_id, d, v, ttc in zip(
+                columns["person_id"].tolist(),
+                columns["vehicle_id"].tolist(),
+                columns["distance"].tolist(),
+                columns["relative_velocity"].tolist(),
+                columns["ttc"].tolist(),
+            )
+        ]
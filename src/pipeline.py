@@ -0,0 +1,112 @@
+# src/pipeline.py
+
+import queue
+import threading
+
+from src.metrics import metrics
+from src.video_io import read_batches
+
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+class StagedPipeline:
+    """
+    Decode and inference stages running on their own threads.
+
+    decoder thread -> frames queue -> inference thread -> detections queue -> caller
+
+    Both queues are bounded, so a slow stage blocks the one feeding it
+    instead of buffering the whole video in memory. Iterating the pipeline
+    yields (frame, detections) per frame, in decode order.
+    """
+
+    def __init__(self, cap, detector, batch_size=8, queue_size=4):
+        self.cap = cap
+        self.detector = detector
+        self.batch_size = batch_size
+
+        self._frames = queue.Queue(maxsize=queue_size)
+        self._detections = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _put(self, q, item):
+        # Blocking put that still notices a stop request
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _decode(self):
+        try:
+            batches = read_batches(self.cap, self.batch_size)
+            while True:
+                with metrics.span("decode"):
+                    frames = next(batches, None)
+                if frames is None:
+                    break
+                if not self._put(self._frames, frames):
+                    return
+            self._put(self._frames, _DONE)
+        except Exception as e:
+            self._put(self._frames, _StageError(e))
+
+    def _infer(self):
+        try:
+            while True:
+                frames = self._get(self._frames)
+
+                if frames is _DONE or isinstance(frames, _StageError):
+                    self._put(self._detections, frames)
+                    return
+
+                with metrics.span("detect"):
+                    detections = self.detector.detect_batch(frames)
+                if not self._put(self._detections, list(zip(frames, detections))):
+                    return
+        except Exception as e:
+            self._put(self._detections, _StageError(e))
+
+    def start(self):
+        for target in (self._decode, self._infer):
+            t = threading.Thread(target=target, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def __iter__(self):
+        self.start()
+        try:
+            while True:
+                batch = self._get(self._detections)
+
+                if batch is _DONE:
+                    return
+                if isinstance(batch, _StageError):
+                    raise batch.exc
+
+                yield from batch
+        finally:
+            self.stop()
@@ -2,67 +2,154 @@
 
 import numpy as np
 
+from src.track_store import pair_keys, split_pair_key
 
-class NearMissRiskModel:
-    def compute_nmrs(self, motion_data):
-        results = []
 
-        for m in motion_data:
-            d = max(m["distance"], 0.1)
-            v = max(m["relative_velocity"], 0.0)
-            ttc = m["ttc"]
+def risk_level(nmrs, near_miss=True):
+    """HIGH above 0.7 NMRS, MEDIUM for other near misses, LOW otherwise."""
+    if not near_miss:
+        return "LOW"
+    return "HIGH" if nmrs > 0.7 else "MEDIUM"
 
-            if ttc == float("inf") or ttc <= 0:
-                ttc = 10.0
 
-            ttc = np.clip(ttc, 0.1, 10.0)
-
-            risk = (
-                0.5 * (1 / d) +
-                0.3 * v +
-                0.2 * (1 / ttc)
-            )
+class NearMissRiskModel:
+    def compute_nmrs_arrays(self, distance, relative_velocity, ttc):
+        """
+        Columnar NMRS: arrays of distance, velocity and TTC in, array of
+        scores out.
+        """
+        d = np.maximum(np.asarray(distance, dtype=np.float64), 0.1)
+        v = np.maximum(np.asarray(relative_velocity, dtype=np.float64), 0.0)
+        ttc = np.asarray(ttc, dtype=np.float64)
+
+        ttc = np.where((ttc == np.inf) | (ttc <= 0), 10.0, ttc)
+        ttc = np.clip(ttc, 0.1, 10.0)
+
+        risk = (
+            0.5 * (1 / d) +
+            0.3 * v +
+            0.2 * (1 / ttc)
+        )
+
+        return np.tanh(risk)
 
-            nmrs = np.tanh(risk)
+    def compute_nmrs(self, motion_data):
+        if not motion_data:
+            return []
 
-            results.append({**m, "nmrs": float(nmrs)})
+        nmrs = self.compute_nmrs_arrays(
+            [m["distance"] for m in motion_data],
+            [m["relative_velocity"] for m in motion_data],
+            [m["ttc"] for m in motion_data],
+        )
 
-        return results
+        return [dict(m, nmrs=score) for m, score in zip(motion_data, nmrs.tolist())]
 
 
 class NearMissEventDetector:
-    def __init__(self):
-        self.states = {}
-
-    def update(self, risk_data):
-        results = []
-
-        for r in risk_data:
-            key = (r["person_id"], r["vehicle_id"])
-            nmrs = r["nmrs"]
-            d = r["distance"]
-            v = r["relative_velocity"]
-
-            if key not in self.states:
-                self.states[key] = {
-                    "count": 0,
-                    "active": False
-                }
-
-            state = self.states[key]
+    """
+    Hysteresis per (person_id, vehicle_id) pair: a pair becomes a near
+    miss after two risky frames in a row and stays one.
 
-            if nmrs > 0.5 or (d < 1.0 and v > 0):
-                state["count"] += 1
-            else:
-                state["count"] = max(0, state["count"] - 1)
+    Counters live in arrays sorted by pair key. `states` is a read-only
+    snapshot of them as a per-pair dict, built on each access; writing to
+    it does not change the detector. Use get() for one pair and reset()
+    to forget every pair.
+    """
 
-            if state["count"] >= 2:
-                state["active"] = True
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.active = np.empty(0, dtype=bool)
+
+    @property
+    def states(self):
+        return {
+            split_pair_key(key): {"count": count, "active": active}
+            for key, count, active in zip(
+                self.keys.tolist(), self.counts.tolist(), self.active.tolist()
+            )
+        }
+
+    def get(self, person_id, vehicle_id):
+        """{"count", "active"} of one pair, or None if it was never scored."""
+        key = int(pair_keys(person_id, vehicle_id))
+        row = int(np.searchsorted(self.keys, key))
+
+        if row == len(self.keys) or self.keys[row] != key:
+            return None
+        return {"count": int(self.counts[row]), "active": bool(self.active[row])}
+
+    def state_dict(self):
+        return {
+            "keys": self.keys.tolist(),
+            "counts": self.counts.tolist(),
+            "active": self.active.tolist()
+        }
+
+    def load_state_dict(self, state):
+        self.keys = np.array(state["keys"], dtype=np.int64)
+        self.counts = np.array(state["counts"], dtype=np.int64)
+        self.active = np.array(state["active"], dtype=bool)
+
+    def _rows(self, keys):
+        # Insert unseen keys, keeping the arrays sorted
+        rows = np.searchsorted(self.keys, keys)
+        in_range = rows < len(self.keys)
+        found = np.zeros(len(keys), dtype=bool)
+        found[in_range] = self.keys[rows[in_range]] == keys[in_range]
+
+        if not found.all():
+            new_keys = np.unique(keys[~found])
+            at = np.searchsorted(self.keys, new_keys)
+            self.keys = np.insert(self.keys, at, new_keys)
+            self.counts = np.insert(self.counts, at, 0)
+            self.active = np.insert(self.active, at, False)
+            rows = np.searchsorted(self.keys, keys)
+
+        return rows
+
+    def update_arrays(self, person_ids, vehicle_ids, nmrs, distance, relative_velocity):
+        """
+        Columnar update; each pair should appear at most once per call.
+        Returns the near-miss flag per input row.
+        """
+        keys = pair_keys(person_ids, vehicle_ids)
+        rows = self._rows(keys)
+
+        nmrs = np.asarray(nmrs, dtype=np.float64)
+        d = np.asarray(distance, dtype=np.float64)
+        v = np.asarray(relative_velocity, dtype=np.float64)
+
+        risky = (nmrs > 0.5) | ((d < 1.0) & (v > 0))
+
+        counts = self.counts[rows]
+        counts = np.where(risky, counts + 1, np.maximum(0, counts - 1))
+        self.counts[rows] = counts
+        self.active[rows] |= counts >= 2
+
+        return self.active[rows]
 
-            results.append({
+    def update(self, risk_data):
+        if not risk_data:
+            return []
+
+        near_miss = self.update_arrays(
+            [r["person_id"] for r in risk_data],
+            [r["vehicle_id"] for r in risk_data],
+            [r["nmrs"] for r in risk_data],
+            [r["distance"] for r in risk_data],
+            [r["relative_velocity"] for r in risk_data],
+        )
+
+        return [
+            {
                 **r,
-                "smooth_nmrs": nmrs,
-                "near_miss": state["active"]
-            })
-
-        return results
\ No newline at end of file
+                "smooth_nmrs": r["nmrs"],
+                "near_miss": flag
+            }
+            for r, flag in zip(risk_data, near_miss.tolist())
+        ]
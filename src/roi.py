@@ -0,0 +1,263 @@
+# src/roi.py
+
+import json
+import os
+
+import cv2
+import numpy as np
+
+
+def save_roi(path, polygon, frame_size):
+    """Write an image-space polygon and the (width, height) it was drawn on."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    with open(path, "w") as f:
+        json.dump({
+            "frame_size": [int(frame_size[0]), int(frame_size[1])],
+            "polygon": [[float(x), float(y)] for x, y in polygon]
+        }, f, indent=2)
+
+
+def load_roi(path):
+    """(polygon as an (N, 2) array, (width, height)) from save_roi's file."""
+    with open(path) as f:
+        data = json.load(f)
+
+    return np.array(data["polygon"], dtype=np.float64), tuple(data["frame_size"])
+
+
+class MotionGate:
+    """
+    Finds where something moves in a frame, optionally only inside a
+    static ROI polygon (e.g. the road area from calibrate.py).
+
+    Works on a downscaled grayscale copy, using MOG2 background
+    subtraction or differencing against the last frame that moved.
+    regions() returns full-resolution (x1, y1, x2, y2) boxes, or [] when
+    nothing moves.
+    """
+
+    def __init__(self, method="mog2", roi=None, downscale=0.25, min_area=400,
+                 diff_threshold=25, history=500):
+        if method not in ("mog2", "diff"):
+            raise ValueError(f"Unknown motion method: {method}")
+
+        self.method = method
+        self.roi = roi
+        self.downscale = downscale
+        self.min_area = min_area
+        self.diff_threshold = diff_threshold
+
+        self._subtractor = None
+        if method == "mog2":
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(
+                history=history, detectShadows=False
+            )
+
+        self._previous = None
+        self._mask = None
+        self._size = None
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+    def _roi_mask(self, small_size, frame_size):
+        polygon, roi_size = self.roi
+
+        # Polygon coordinates scaled from the calibration frame to this one
+        scale = np.array([
+            small_size[0] / roi_size[0], small_size[1] / roi_size[1]
+        ])
+        points = np.round(polygon * scale).astype(np.int32)
+
+        mask = np.zeros((small_size[1], small_size[0]), dtype=np.uint8)
+        cv2.fillPoly(mask, [points], 255)
+        return mask
+
+    def roi_bounds(self, frame_size):
+        """Full-resolution bounding box of the ROI, or the whole frame."""
+        w, h = frame_size
+        if self.roi is None:
+            return (0, 0, w, h)
+
+        polygon, roi_size = self.roi
+        points = polygon * np.array([w / roi_size[0], h / roi_size[1]])
+        x1, y1 = np.floor(points.min(axis=0)).astype(int)
+        x2, y2 = np.ceil(points.max(axis=0)).astype(int)
+        return (max(0, x1), max(0, y1), min(w, x2), min(h, y2))
+
+    def regions(self, frame):
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, None, fx=self.downscale, fy=self.downscale,
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        if self._size != (w, h):
+            self._size = (w, h)
+            self._previous = None
+            self._mask = None
+            if self.roi is not None:
+                self._mask = self._roi_mask((gray.shape[1], gray.shape[0]), (w, h))
+
+        if self._subtractor is not None:
+            moving = self._subtractor.apply(gray)
+        else:
+            gray = cv2.GaussianBlur(gray, (5, 5), 0)
+            if self._previous is None:
+                self._previous = gray
+                return [(0, 0, w, h)]
+            _, moving = cv2.threshold(
+                cv2.absdiff(gray, self._previous), self.diff_threshold, 255,
+                cv2.THRESH_BINARY
+            )
+
+        if self._mask is not None:
+            moving = cv2.bitwise_and(moving, self._mask)
+
+        moving = cv2.morphologyEx(moving, cv2.MORPH_OPEN, self._kernel)
+        moving = cv2.dilate(moving, self._kernel, iterations=2)
+
+        n, _, stats, _ = cv2.connectedComponentsWithStats(moving)
+        min_area = self.min_area * self.downscale ** 2
+
+        boxes = []
+        for x, y, bw, bh, area in stats[1:n]:
+            if area < min_area:
+                continue
+            boxes.append((
+                int(x / self.downscale), int(y / self.downscale),
+                min(w, int(np.ceil((x + bw) / self.downscale))),
+                min(h, int(np.ceil((y + bh) / self.downscale)))
+            ))
+
+        # The difference reference only moves on once motion is found, so
+        # slow movement builds up over frames instead of staying under
+        # the threshold
+        if self._subtractor is None and boxes:
+            self._previous = gray
+
+        return boxes
+
+
+class GatedDetector:
+    """
+    Wraps an ObjectDetector so it only looks where something moves.
+
+    - No motion: the previous detections are returned without inference,
+      so stationary objects stay tracked.
+    - Motion: the detector runs once on the union of the moving regions
+      and the previous boxes, padded and clipped to the ROI bounds, and
+      boxes are shifted back to full-frame coordinates.
+    - With an ROI polygon, pixels outside it are blacked out before
+      detection and detections whose footpoint (bottom centre) falls
+      outside it are dropped.
+    - Every refresh_every frames, or when the union covers more than
+      max_crop_fraction of the ROI, the whole ROI is detected.
+
+    Frames must arrive in order; detect_batch runs them one by one.
+    """
+
+    def __init__(self, detector, gate, padding=32, refresh_every=30, max_crop_fraction=0.6):
+        self.detector = detector
+        self.gate = gate
+        self.padding = padding
+        self.refresh_every = refresh_every
+        self.max_crop_fraction = max_crop_fraction
+
+        self._last = None
+        self._since_refresh = 0
+        self._mask = None
+        self._size = None
+
+        self.frames = 0
+        self.skipped = 0
+        self.cropped = 0
+
+    def __getattr__(self, name):
+        # conf_threshold, model and the like come from the wrapped detector
+        return getattr(self.detector, name)
+
+    def _crop_box(self, regions, bounds):
+        boxes = list(regions) + [tuple(d["bbox"]) for d in self._last]
+        boxes = np.array(boxes, dtype=np.int64)
+
+        bx1, by1, bx2, by2 = bounds
+        x1 = max(bx1, int(boxes[:, 0].min()) - self.padding)
+        y1 = max(by1, int(boxes[:, 1].min()) - self.padding)
+        x2 = min(bx2, int(boxes[:, 2].max()) + self.padding)
+        y2 = min(by2, int(boxes[:, 3].max()) + self.padding)
+        return x1, y1, x2, y2
+
+    def _roi_mask(self, frame_size):
+        # Full-resolution polygon mask, rebuilt only when the size changes
+        if self.gate.roi is None:
+            return None
+        if self._size != frame_size:
+            self._size = frame_size
+            self._mask = self.gate._roi_mask(frame_size, frame_size)
+        return self._mask
+
+    def _detect_in(self, frame, box):
+        x1, y1, x2, y2 = box
+        if x2 <= x1 or y2 <= y1:
+            return []
+
+        h, w = frame.shape[:2]
+        mask = self._roi_mask((w, h))
+
+        crop = frame[y1:y2, x1:x2]
+        if mask is not None:
+            crop = cv2.bitwise_and(crop, crop, mask=mask[y1:y2, x1:x2])
+
+        detections = self.detector.detect(crop)
+
+        if x1 or y1:
+            for d in detections:
+                bx1, by1, bx2, by2 = d["bbox"]
+                d["bbox"] = [bx1 + x1, by1 + y1, bx2 + x1, by2 + y1]
+
+        if mask is not None:
+            detections = [d for d in detections if self._inside(mask, d["bbox"])]
+
+        return detections
+
+    @staticmethod
+    def _inside(mask, bbox):
+        h, w = mask.shape
+        x = min(max(int((bbox[0] + bbox[2]) / 2), 0), w - 1)
+        y = min(max(int(bbox[3]), 0), h - 1)
+        return mask[y, x] > 0
+
+    def detect(self, frame):
+        self.frames += 1
+        h, w = frame.shape[:2]
+        bounds = self.gate.roi_bounds((w, h))
+        regions = self.gate.regions(frame)
+
+        self._since_refresh += 1
+
+        if self._last is None or self._since_refresh >= self.refresh_every:
+            box = bounds
+        elif not regions:
+            self.skipped += 1
+            return [dict(d) for d in self._last]
+        else:
+            box = self._crop_box(regions, bounds)
+
+            area = (box[2] - box[0]) * (box[3] - box[1])
+            bounds_area = (bounds[2] - bounds[0]) * (bounds[3] - bounds[1])
+            if area > self.max_crop_fraction * bounds_area:
+                box = bounds
+            else:
+                self.cropped += 1
+
+        if box == bounds:
+            self._since_refresh = 0
+
+        detections = self._detect_in(frame, box)
+        self._last = detections
+        return [dict(d) for d in detections]
+
+    def detect_batch(self, frames):
+        return [self.detect(frame) for frame in frames]
+
+    def stats(self):
+        return {"frames": self.frames, "skipped": self.skipped, "cropped": self.cropped}
@@ -0,0 +1,144 @@
+# src/scheduler.py
+
+import math
+
+
+class DetectionScheduler:
+    """
+    Decides which frames get a real detector pass.
+
+    Detection runs every `interval` frames. In between, the boxes from the
+    last detected frame are moved along at the velocity each object had
+    between the last two detected frames (constant-velocity model), so
+    the tracker and risk stages still see every frame.
+
+    When a frame's peak NMRS reaches nmrs_threshold or its lowest TTC
+    drops to ttc_threshold, detection switches to every `risk_interval`
+    frames for the next hold_frames frames.
+    """
+
+    def __init__(self, interval=3, risk_interval=1, nmrs_threshold=0.5,
+                 ttc_threshold=2.0, hold_frames=30, max_distance=50):
+        self.interval = interval
+        self.risk_interval = risk_interval
+        self.nmrs_threshold = nmrs_threshold
+        self.ttc_threshold = ttc_threshold
+        self.hold_frames = hold_frames
+        self.max_distance = max_distance
+
+        self._last = []
+        self._velocity = []
+        self._since = None
+        self._hold = 0
+
+        self.frames = 0
+        self.detections_run = 0
+
+    @property
+    def current_interval(self):
+        return self.risk_interval if self._hold > 0 else self.interval
+
+    def should_detect(self):
+        return self._since is None or self._since + 1 >= self.current_interval
+
+    def next(self, frame, detector):
+        """Detections for the next frame, real or propagated."""
+        self.frames += 1
+
+        if self.should_detect():
+            detections = detector.detect(frame)
+            self.observe(detections)
+            return detections
+
+        return self.propagate()
+
+    def _centroid(self, bbox):
+        x1, y1, x2, y2 = bbox
+        return ((x1 + x2) / 2, (y1 + y2) / 2)
+
+    def observe(self, detections):
+        """Record a detected frame and estimate per-object velocity."""
+        elapsed = 1 if self._since is None else self._since + 1
+        gate = self.max_distance * elapsed
+
+        previous = [(d["class"], self._centroid(d["bbox"])) for d in self._last]
+        used = set()
+        velocity = []
+
+        # Nearest unused same-class box from the previous detected frame
+        for det in detections:
+            cx, cy = self._centroid(det["bbox"])
+            best, best_d = None, gate
+
+            for j, (cls, (px, py)) in enumerate(previous):
+                if cls != det["class"] or j in used:
+                    continue
+                d = math.hypot(cx - px, cy - py)
+                if d < best_d:
+                    best, best_d = j, d
+
+            if best is None:
+                velocity.append((0.0, 0.0))
+            else:
+                used.add(best)
+                px, py = previous[best][1]
+                velocity.append(((cx - px) / elapsed, (cy - py) / elapsed))
+
+        self._last = detections
+        self._velocity = velocity
+        self._since = 0
+        self.detections_run += 1
+
+    def propagate(self):
+        """Last detected boxes moved on by one more frame."""
+        self._since += 1
+        n = self._since
+
+        detections = []
+        for det, (vx, vy) in zip(self._last, self._velocity):
+            dx, dy = round(vx * n), round(vy * n)
+            x1, y1, x2, y2 = det["bbox"]
+            detections.append(dict(det, bbox=[x1 + dx, y1 + dy, x2 + dx, y2 + dy]))
+
+        return detections
+
+    def update_risk(self, peak_nmrs=None, min_ttc=None):
+        """Feed back the current frame's risk; call once per frame."""
+        risky = (
+            (peak_nmrs is not None and peak_nmrs >= self.nmrs_threshold)
+            or (min_ttc is not None and min_ttc <= self.ttc_threshold)
+        )
+
+        if risky:
+            self._hold = self.hold_frames
+        elif self._hold > 0:
+            self._hold -= 1
+
+    def state_dict(self):
+        """Last detected boxes, their velocities and the interval state."""
+        return {
+            "last": [
+                dict(d, bbox=[int(v) for v in d["bbox"]], confidence=float(d["confidence"]))
+                for d in self._last
+            ],
+            "velocity": [list(v) for v in self._velocity],
+            "since": self._since,
+            "hold": self._hold,
+            "frames": self.frames,
+            "detections_run": self.detections_run
+        }
+
+    def load_state_dict(self, state):
+        self._last = state["last"]
+        self._velocity = [tuple(v) for v in state["velocity"]]
+        self._since = state["since"]
+        self._hold = state["hold"]
+        self.frames = state["frames"]
+        self.detections_run = state["detections_run"]
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "detections_run": self.detections_run,
+            "skipped": self.frames - self.detections_run,
+        }
@@ -0,0 +1,134 @@
+# src/telemetry.py
+
+from collections import deque
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+
+class TelemetryClient:
+    """
+    Sends event records to the dashboard API from a background thread.
+
+    send() only appends to a bounded in-memory queue, so the capture loop
+    never waits on the network. The sender posts up to batch_size records
+    at a time over one keep-alive session and retries failed batches with
+    exponential backoff. When the queue is full the oldest records are
+    dropped and counted.
+    """
+
+    def __init__(self, url="http://127.0.0.1:8000/analyze/batch", batch_size=32,
+                 flush_interval=0.5, max_queue=1000, max_retries=3, backoff=0.25,
+                 timeout=2.0):
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+
+        self._queue = deque(maxlen=max_queue)
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="aegis-telemetry", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def send(self, record):
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(record)
+
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+
+    def _next_batch(self):
+        with self._cond:
+            if len(self._queue) < self.batch_size and not self._stop:
+                self._cond.wait(self.flush_interval)
+
+            n = min(len(self._queue), self.batch_size)
+            return [self._queue.popleft() for _ in range(n)]
+
+    def _post(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(self.url, json=batch, timeout=self.timeout)
+
+                if response.status_code < 500:
+                    # 4xx will not succeed on retry either
+                    if not response.ok:
+                        logger.warning("Telemetry batch rejected: HTTP %s", response.status_code)
+                    return response.ok
+                logger.debug("Telemetry post failed: HTTP %s", response.status_code)
+            except requests.RequestException as e:
+                logger.debug("Telemetry post failed: %s", e)
+
+            if attempt < self.max_retries and not self._stop:
+                time.sleep(self.backoff * 2 ** attempt)
+
+        return False
+
+    def _run(self):
+        try:
+            while True:
+                batch = self._next_batch()
+
+                if batch:
+                    if self._post(batch):
+                        self.sent += len(batch)
+                    else:
+                        self.failed += len(batch)
+                        logger.warning("Dropped %d telemetry records after %d attempts",
+                                       len(batch), self.max_retries + 1)
+                elif self._stop:
+                    return
+        finally:
+            # The session belongs to this thread once it is started
+            self.session.close()
+
+    def close(self, timeout=5.0):
+        """
+        Flush what is queued, waiting at most `timeout` seconds. If the
+        sender is still posting after that it keeps going in the
+        background and closes the session when it finishes.
+        """
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+
+        if self._thread is None:
+            self.session.close()
+            return
+
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Telemetry sender still flushing %d records after %.1fs",
+                           len(self._queue), timeout)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,213 @@
+# src/track_store.py
+
+import numpy as np
+
+
+# Class codes stored in TrackStore.classes
+PERSON = 0
+VEHICLE = 1
+CLASS_CODES = {"person": PERSON, "vehicle": VEHICLE}
+CLASS_NAMES = ("person", "vehicle")
+
+
+def pair_keys(person_ids, vehicle_ids):
+    """One int64 key per (person_id, vehicle_id): person_id << 32 | vehicle_id."""
+    return (
+        (np.asarray(person_ids, dtype=np.int64) << 32)
+        | np.asarray(vehicle_ids, dtype=np.int64)
+    )
+
+
+def split_pair_key(key):
+    return key >> 32, key & 0xFFFFFFFF
+
+
+class TrackView:
+    """
+    Read-only view of one row of a TrackStore.
+
+    Supports obj["id"], obj["class"], obj["centroid"], obj["bbox"] and
+    obj["missed"] like the tracker's dicts. A view points at a row, not a
+    track, so it is only valid until the next tracker update.
+    """
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    @property
+    def id(self):
+        return int(self._store.ids[self._row])
+
+    @property
+    def class_name(self):
+        return CLASS_NAMES[self._store.classes[self._row]]
+
+    @property
+    def centroid(self):
+        x, y = self._store.centroids[self._row]
+        return (int(x), int(y))
+
+    @property
+    def bbox(self):
+        return self._store.bboxes[self._row].tolist()
+
+    @property
+    def missed(self):
+        return int(self._store.missed[self._row])
+
+    def __getitem__(self, key):
+        if key == "class":
+            return self.class_name
+        if key in ("id", "centroid", "bbox", "missed"):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "class": self.class_name,
+            "centroid": self.centroid,
+            "bbox": self.bbox,
+            "missed": self.missed
+        }
+
+    def __repr__(self):
+        return f"TrackView({self.as_dict()})"
+
+
+class TrackStore:
+    """
+    Preallocated column arrays for the live tracks.
+
+    Rows 0..size-1 are live, in the same order the dict tracker would
+    return them. Arrays grow by doubling and are never shrunk, so a
+    steady-state frame allocates no per-track objects.
+    """
+
+    def __init__(self, capacity=64):
+        self.size = 0
+        self.capacity = 0
+        self._front = None
+        self._back = None
+        self._views = []
+        self._grow(capacity)
+
+    @staticmethod
+    def _columns(capacity):
+        return {
+            "ids": np.zeros(capacity, dtype=np.int64),
+            "classes": np.zeros(capacity, dtype=np.int8),
+            "centroids": np.zeros((capacity, 2), dtype=np.int64),
+            "bboxes": np.zeros((capacity, 4), dtype=np.int64),
+            "missed": np.zeros(capacity, dtype=np.int32),
+        }
+
+    def _grow(self, capacity):
+        front = self._columns(capacity)
+
+        if self._front is not None:
+            for name, col in self._front.items():
+                front[name][:self.size] = col[:self.size]
+
+        self._front = front
+        self._back = self._columns(capacity)
+        self.capacity = capacity
+
+    def reserve(self, n):
+        if n > self.capacity:
+            capacity = max(self.capacity, 1)
+            while capacity < n:
+                capacity *= 2
+            self._grow(capacity)
+
+    @property
+    def ids(self):
+        return self._front["ids"]
+
+    @property
+    def classes(self):
+        return self._front["classes"]
+
+    @property
+    def centroids(self):
+        return self._front["centroids"]
+
+    @property
+    def bboxes(self):
+        return self._front["bboxes"]
+
+    @property
+    def missed(self):
+        return self._front["missed"]
+
+    def rebuild(self, ids, classes, centroids, bboxes, keep_rows):
+        """
+        Lay out this frame's tracks: detections first, then the kept rows
+        of the previous frame, written into the spare buffer and swapped in.
+        """
+        k = len(ids)
+        n = k + len(keep_rows)
+        self.reserve(n)
+
+        front, back = self._front, self._back
+
+        back["ids"][:k] = ids
+        back["classes"][:k] = classes
+        back["centroids"][:k] = centroids
+        back["bboxes"][:k] = bboxes
+        back["missed"][:k] = 0
+
+        for name, col in front.items():
+            back[name][k:n] = col[keep_rows]
+
+        self._front, self._back = back, front
+        self.size = n
+
+    def load(self, objects):
+        """Replace the contents with dicts in the tracker's dict shape."""
+        objects = list(objects)
+        n = len(objects)
+        self.reserve(n)
+
+        for row, obj in enumerate(objects):
+            self.ids[row] = obj["id"]
+            self.classes[row] = CLASS_CODES[obj["class"]]
+            self.centroids[row] = obj["centroid"]
+            self.bboxes[row] = obj["bbox"]
+            self.missed[row] = obj["missed"]
+
+        self.size = n
+
+    def views(self):
+        while len(self._views) < self.size:
+            self._views.append(TrackView(self, len(self._views)))
+        return self._views[:self.size]
+
+    def to_dicts(self):
+        """Compatibility adapter: the live tracks as plain dicts."""
+        n = self.size
+        return [
+            {
+                "id": obj_id,
+                "class": CLASS_NAMES[code],
+                "centroid": tuple(centroid),
+                "bbox": bbox,
+                "missed": missed
+            }
+            for obj_id, code, centroid, bbox, missed in zip(
+                self.ids[:n].tolist(),
+                self.classes[:n].tolist(),
+                self.centroids[:n].tolist(),
+                self.bboxes[:n].tolist(),
+                self.missed[:n].tolist(),
+            )
+        ]
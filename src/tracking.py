@@ -1,15 +1,30 @@
 # src/tracking.py
 
 import math
+import numpy as np
+
+from src.track_store import TrackStore, CLASS_CODES
 
 
 class CentroidTracker:
-    def __init__(self, max_distance=50, max_missed=5):
+    def __init__(self, max_distance=50, max_missed=5, matcher="greedy"):
         self.next_id = 0
         self.objects = {}
         self.max_distance = max_distance
         self.max_missed = max_missed
 
+        # "greedy": nearest free track per detection, in detection order
+        # "hungarian": optimal per-class assignment on the distance matrix
+        if matcher == "greedy":
+            self._match = self._match_greedy
+        elif matcher == "hungarian":
+            from scipy.optimize import linear_sum_assignment
+            self._linear_sum_assignment = linear_sum_assignment
+            self._match = self._match_hungarian
+        else:
+            raise ValueError(f"Unknown matcher: {matcher}")
+        self.matcher = matcher
+
     def _centroid(self, bbox):
         x1, y1, x2, y2 = bbox
         return ((x1 + x2) // 2, (y1 + y2) // 2)
@@ -17,14 +32,12 @@ class CentroidTracker:
     def _distance(self, c1, c2):
         return math.sqrt((c1[0] - c2[0])**2 + (c1[1] - c2[1])**2)
 
-    def update(self, detections):
-        updated_objects = {}
+    def _match_greedy(self, detections, centroids):
+        matches = {}
         used_ids = set()
 
-        for det in detections:
-            bbox = det["bbox"]
+        for i, det in enumerate(detections):
             cls = det["class"]
-            centroid = self._centroid(bbox)
 
             min_dist = float("inf")
             matched_id = None
@@ -33,31 +46,81 @@ class CentroidTracker:
                 if obj["class"] != cls or obj_id in used_ids:
                     continue
 
-                dist = self._distance(centroid, obj["centroid"])
+                dist = self._distance(centroids[i], obj["centroid"])
                 if dist < min_dist and dist < self.max_distance:
                     min_dist = dist
                     matched_id = obj_id
 
             if matched_id is not None:
-                updated_objects[matched_id] = {
-                    "id": matched_id,
-                    "class": cls,
-                    "centroid": centroid,
-                    "bbox": bbox,
-                    "missed": 0
-                }
+                matches[i] = matched_id
                 used_ids.add(matched_id)
-            else:
-                new_id = self.next_id
+
+        return matches
+
+    def _assign_optimal(self, det_classes, det_points, obj_classes, obj_points):
+        """
+        Per-class optimal assignment gated by max_distance.
+        Returns (det_index, obj_index) pairs into the given arrays.
+        """
+        pairs = []
+
+        for cls in np.unique(det_classes):
+            det_idx = np.flatnonzero(det_classes == cls)
+            obj_idx = np.flatnonzero(obj_classes == cls)
+
+            if len(obj_idx) == 0:
+                continue
+
+            diff = det_points[det_idx, None, :] - obj_points[None, obj_idx, :]
+            cost = np.hypot(diff[..., 0], diff[..., 1])
+
+            # Gated pairs get a cost no valid assignment can reach
+            gated = cost >= self.max_distance
+            cost[gated] = self.max_distance * (len(det_idx) + len(obj_idx) + 1)
+
+            rows, cols = self._linear_sum_assignment(cost)
+            valid = ~gated[rows, cols]
+
+            pairs.extend(zip(det_idx[rows[valid]].tolist(), obj_idx[cols[valid]].tolist()))
+
+        return pairs
+
+    def _match_hungarian(self, detections, centroids):
+        if not detections or not self.objects:
+            return {}
+
+        obj_ids = list(self.objects.keys())
+        pairs = self._assign_optimal(
+            np.array([det["class"] for det in detections]),
+            np.array(centroids, dtype=np.float64),
+            np.array([obj["class"] for obj in self.objects.values()]),
+            np.array([obj["centroid"] for obj in self.objects.values()], dtype=np.float64),
+        )
+
+        return {i: obj_ids[j] for i, j in pairs}
+
+    def update(self, detections):
+        updated_objects = {}
+        used_ids = set()
+
+        centroids = [self._centroid(det["bbox"]) for det in detections]
+        matches = self._match(detections, centroids)
+
+        for i, det in enumerate(detections):
+            obj_id = matches.get(i)
+
+            if obj_id is None:
+                obj_id = self.next_id
                 self.next_id += 1
-                updated_objects[new_id] = {
-                    "id": new_id,
-                    "class": cls,
-                    "centroid": centroid,
-                    "bbox": bbox,
-                    "missed": 0
-                }
-                used_ids.add(new_id)
+
+            updated_objects[obj_id] = {
+                "id": obj_id,
+                "class": det["class"],
+                "centroid": centroids[i],
+                "bbox": det["bbox"],
+                "missed": 0
+            }
+            used_ids.add(obj_id)
 
         # Handle missed objects
         for obj_id, obj in self.objects.items():
@@ -68,3 +131,125 @@ class CentroidTracker:
 
         self.objects = updated_objects
         return list(self.objects.values())
+
+    def state_dict(self):
+        """Live tracks and the id counter as plain JSON-able values."""
+        return {
+            "next_id": int(self.next_id),
+            "objects": [
+                {
+                    "id": int(obj["id"]),
+                    "class": obj["class"],
+                    "centroid": [int(v) for v in obj["centroid"]],
+                    "bbox": [int(v) for v in obj["bbox"]],
+                    "missed": int(obj["missed"])
+                }
+                for obj in self.objects.values()
+            ]
+        }
+
+    def load_state_dict(self, state):
+        self.next_id = state["next_id"]
+        self.objects = {
+            obj["id"]: dict(obj, centroid=tuple(obj["centroid"]))
+            for obj in state["objects"]
+        }
+
+
+class ArrayCentroidTracker(CentroidTracker):
+    """
+    CentroidTracker backed by a TrackStore.
+
+    update() writes the tracks into preallocated arrays and returns
+    TrackView rows instead of new dicts; the ids, ordering and matching
+    are the same as the dict tracker with the same matcher.
+    """
+
+    def __init__(self, max_distance=50, max_missed=5, matcher="greedy", capacity=64):
+        self.store = TrackStore(capacity)
+        super().__init__(max_distance, max_missed, matcher)
+
+    @property
+    def objects(self):
+        return {obj["id"]: obj for obj in self.store.to_dicts()}
+
+    @objects.setter
+    def objects(self, objects):
+        self.store.load(objects.values())
+
+    def _match_rows_greedy(self, det_classes, det_points):
+        store = self.store
+        n = store.size
+        rows = np.full(len(det_classes), -1, dtype=np.int64)
+
+        if n == 0:
+            return rows
+
+        diff = det_points[:, None, :] - store.centroids[None, :n, :]
+        dist = np.sqrt((diff ** 2).sum(axis=2))
+        dist[(det_classes[:, None] != store.classes[None, :n]) | (dist >= self.max_distance)] = np.inf
+
+        # Detection order, first nearest row wins, each row used once
+        for i in range(len(det_classes)):
+            j = int(np.argmin(dist[i]))
+            if dist[i, j] == np.inf:
+                continue
+            rows[i] = j
+            dist[:, j] = np.inf
+
+        return rows
+
+    def _match_rows_hungarian(self, det_classes, det_points):
+        store = self.store
+        n = store.size
+        rows = np.full(len(det_classes), -1, dtype=np.int64)
+
+        if n == 0:
+            return rows
+
+        pairs = self._assign_optimal(
+            det_classes, det_points.astype(np.float64),
+            store.classes[:n], store.centroids[:n].astype(np.float64),
+        )
+        for i, j in pairs:
+            rows[i] = j
+
+        return rows
+
+    def update_store(self, detections):
+        store = self.store
+        n = store.size
+        k = len(detections)
+
+        det_classes = np.fromiter(
+            (CLASS_CODES[det["class"]] for det in detections), dtype=np.int8, count=k
+        )
+        det_bboxes = np.array([det["bbox"] for det in detections], dtype=np.int64).reshape(k, 4)
+        det_points = np.empty((k, 2), dtype=np.int64)
+        det_points[:, 0] = (det_bboxes[:, 0] + det_bboxes[:, 2]) // 2
+        det_points[:, 1] = (det_bboxes[:, 1] + det_bboxes[:, 3]) // 2
+
+        if self.matcher == "greedy":
+            rows = self._match_rows_greedy(det_classes, det_points)
+        else:
+            rows = self._match_rows_hungarian(det_classes, det_points)
+
+        matched = rows >= 0
+        det_ids = np.empty(k, dtype=np.int64)
+        det_ids[matched] = store.ids[rows[matched]]
+
+        new_count = k - int(matched.sum())
+        det_ids[~matched] = np.arange(self.next_id, self.next_id + new_count)
+        self.next_id += new_count
+
+        # Handle missed objects
+        unmatched = np.ones(n, dtype=bool)
+        unmatched[rows[matched]] = False
+        store.missed[:n][unmatched] += 1
+        keep_rows = np.flatnonzero(unmatched & (store.missed[:n] <= self.max_missed))
+
+        store.rebuild(det_ids, det_classes, det_points, det_bboxes, keep_rows)
+        return store
+
+    def update(self, detections):
+        return self.update_store(detections).views()
@@ -1,7 +1,9 @@
 # src/video_io.py
 
 from typing import Union
+import subprocess
 import cv2
+import numpy as np
 
 
 def open_video(source: Union[int, str] = 0):
@@ -30,3 +32,346 @@ def release_video(cap):
     Release the video capture object.
     """
     cap.release()
+
+
+def read_batches(cap, batch_size):
+    """
+    Yield lists of up to batch_size consecutive frames until the source ends.
+    """
+    while True:
+        frames = []
+        while len(frames) < batch_size:
+            ret, frame = read_frame(cap)
+            if not ret:
+                break
+            frames.append(frame)
+
+        if not frames:
+            return
+
+        yield frames
+
+        if len(frames) < batch_size:
+            return
+
+
+def keyframe_indices(path):
+    """
+    1-based numbers of a video file's keyframes, read from its packets
+    without decoding them. [] if the file cannot be read that way.
+    """
+    cap = cv2.VideoCapture(path)
+
+    try:
+        # CAP_PROP_FORMAT -1 makes grab() return raw packets
+        if not cap.isOpened() or not cap.set(cv2.CAP_PROP_FORMAT, -1):
+            return []
+
+        keyframes = []
+        index = 0
+        while cap.grab():
+            index += 1
+            if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                keyframes.append(index)
+    finally:
+        cap.release()
+
+    return keyframes
+
+
+def seek_frame(cap, frame, keyframes):
+    """
+    Position cap so the next read returns `frame` (1-based).
+
+    A frame seek can land a few frames off on long-GOP video unless it
+    targets a keyframe, so this seeks to the keyframe at or before frame
+    and grabs the rest of the way. Without keyframes it grabs from the
+    current position, which must be the first frame.
+    """
+    keyframe = 1
+    for k in keyframes:
+        if k > frame:
+            break
+        keyframe = k
+
+    if keyframe > 1:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe - 1)
+
+    # grab() decodes without the colour conversion read() does
+    for _ in range(frame - keyframe):
+        if not cap.grab():
+            break
+
+
+def sample_frames(path, count):
+    """Up to `count` frames spread evenly over a video file."""
+    cap = open_video(path)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or count
+    step = max(1, total // count)
+
+    frames = []
+    for index in range(0, total, step):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ret, frame = read_frame(cap)
+        if not ret or len(frames) == count:
+            break
+        frames.append(frame)
+
+    release_video(cap)
+    return frames
+
+
+def scale_detections(detections, sx, sy):
+    """Map detection boxes from a resized frame back to source pixels."""
+    scaled = []
+    for d in detections:
+        x1, y1, x2, y2 = d["bbox"]
+        scaled.append(dict(d, bbox=[
+            int(round(x1 * sx)), int(round(y1 * sy)),
+            int(round(x2 * sx)), int(round(y2 * sy))
+        ]))
+    return scaled
+
+
+class OpenCVDecoder:
+    """
+    cv2.VideoCapture with optional hardware decoding and resize on read.
+
+    Has the VideoCapture methods the pipeline uses (read, grab, get, set,
+    release), so it can stand in for one. grab() advances without
+    retrieving, so skipped frames skip the colour conversion and copy.
+
+    With reuse_buffer=True every read() returns the same preallocated
+    array; only use it when each frame is consumed before the next read.
+    interpolation is the cv2 flag used for the resize.
+    """
+
+    def __init__(self, source=0, size=None, hw_accel=False, reuse_buffer=False,
+                 interpolation=cv2.INTER_AREA):
+        if hw_accel:
+            cap = cv2.VideoCapture(
+                source, cv2.CAP_ANY,
+                [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+            )
+        else:
+            cap = cv2.VideoCapture(source)
+
+        if not cap.isOpened():
+            raise RuntimeError("Error: Could not open video source.")
+
+        self.cap = cap
+        self.size = tuple(size) if size else None
+        self.reuse_buffer = reuse_buffer
+        self.interpolation = interpolation
+
+        self._raw = None
+        self._buffer = None
+        if reuse_buffer and self.size:
+            w, h = self.size
+            self._buffer = np.empty((h, w, 3), dtype=np.uint8)
+
+    @property
+    def source_size(self):
+        return (
+            int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        )
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def grab(self):
+        return self.cap.grab()
+
+    def skip(self, n):
+        """Advance n frames without retrieving them."""
+        for _ in range(n):
+            if not self.cap.grab():
+                return False
+        return True
+
+    def read(self):
+        if self.reuse_buffer:
+            ret, raw = self.cap.read(self._raw)
+            self._raw = raw
+        else:
+            ret, raw = self.cap.read()
+
+        if not ret:
+            return False, None
+
+        if self.size is None:
+            return True, raw
+
+        dst = self._buffer if self.reuse_buffer else None
+        return True, cv2.resize(raw, self.size, dst=dst, interpolation=self.interpolation)
+
+    def get(self, prop):
+        if self.size and prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.size[0])
+        if self.size and prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.size[1])
+        return self.cap.get(prop)
+
+    def set(self, prop, value):
+        return self.cap.set(prop, value)
+
+    def release(self):
+        self.cap.release()
+
+
+class FFmpegDecoder:
+    """
+    Decodes through an ffmpeg subprocess into raw BGR frames on a pipe.
+
+    ffmpeg scales to `size` while decoding. keyframes_only decodes only
+    keyframes (-skip_frame nokey) for fast scans. step=N passes every Nth
+    frame, so skipped frames are never converted, scaled or copied. Frames
+    are read straight into a preallocated array, and with reuse_buffer=True
+    the same array is returned on every read().
+    """
+
+    def __init__(self, path, size=None, keyframes_only=False, step=1, hwaccel=None,
+                 reuse_buffer=False):
+        import ffmpeg
+
+        self._ffmpeg = ffmpeg
+        self.path = path
+        self.keyframes_only = keyframes_only
+        self.step = step
+        self.hwaccel = hwaccel
+        self.reuse_buffer = reuse_buffer
+
+        self.source_size, self.fps, self.frame_count = self._probe(path)
+
+        w, h = tuple(size) if size else self.source_size
+        self.size = (w, h)
+        self._frame_bytes = w * h * 3
+        self._buffer = np.empty((h, w, 3), dtype=np.uint8)
+
+        self._process = None
+        self._position = 0
+        self._start(0)
+
+    def _probe(self, path):
+        try:
+            info = self._ffmpeg.probe(path, select_streams="v:0")
+            stream = info["streams"][0]
+            num, den = stream.get("avg_frame_rate", "0/1").split("/")
+            fps = float(num) / float(den) if float(den) else 0.0
+            count = int(stream.get("nb_frames", 0)) or int(
+                float(info.get("format", {}).get("duration", 0)) * fps
+            )
+            return (int(stream["width"]), int(stream["height"])), fps, count
+        except Exception:
+            # No ffprobe on the PATH; read the container through OpenCV
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                raise RuntimeError("Error: Could not open video source.")
+            size = (
+                int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            )
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            return size, fps, count
+
+    def _start(self, frame):
+        self.release()
+
+        input_args = {}
+        if frame and self.fps:
+            input_args["ss"] = frame * self.step / self.fps
+        if self.keyframes_only:
+            input_args["skip_frame"] = "nokey"
+        if self.hwaccel:
+            input_args["hwaccel"] = self.hwaccel
+
+        stream = self._ffmpeg.input(self.path, **input_args)
+
+        if self.step > 1:
+            stream = stream.filter("select", f"not(mod(n,{self.step}))")
+        if self.size != self.source_size:
+            stream = stream.filter("scale", self.size[0], self.size[1])
+
+        output_args = {"format": "rawvideo", "pix_fmt": "bgr24"}
+        if self.step > 1 or self.keyframes_only:
+            # Only the selected frames, without duplicates to keep the rate
+            output_args["vsync"] = "vfr"
+
+        # stderr is discarded rather than piped: an unread pipe would fill
+        # up with log lines and stall the decoder
+        args = stream.output("pipe:", **output_args).global_args("-loglevel", "error")
+        self._process = subprocess.Popen(
+            args.compile(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        self._position = frame
+
+    def isOpened(self):
+        return self._process is not None
+
+    def _read_into(self, buffer):
+        view = memoryview(buffer).cast("B")
+        filled = 0
+
+        while filled < self._frame_bytes:
+            n = self._process.stdout.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+
+        self._position += 1
+        return True
+
+    def grab(self):
+        # The frame has to leave the pipe; it goes into the shared buffer
+        return self._process is not None and self._read_into(self._buffer)
+
+    def read(self):
+        if self._process is None:
+            return False, None
+
+        frame = self._buffer if self.reuse_buffer else np.empty_like(self._buffer)
+
+        if not self._read_into(frame):
+            return False, None
+        return True, frame
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps / self.step
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(-(-self.frame_count // self.step))
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._position)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.size[0])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.size[1])
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self._start(int(value))
+            return True
+        return False
+
+    def release(self):
+        if self._process is not None:
+            self._process.stdout.close()
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+
+
+def open_decoder(source=0, backend="opencv", **options):
+    """
+    Open a decoder: "opencv" (OpenCVDecoder) or "ffmpeg" (FFmpegDecoder).
+    Both can be used wherever open_video's capture is.
+    """
+    if backend == "opencv":
+        return OpenCVDecoder(source, **options)
+    if backend == "ffmpeg":
+        return FFmpegDecoder(source, **options)
+    raise ValueError(f"Unknown decoder backend: {backend}")